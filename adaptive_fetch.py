@@ -0,0 +1,93 @@
+"""
+Adaptive fetch depth for the trusted sources researcher
+
+Instead of querying every provider to a fixed depth, the fetch stage asks
+an AdaptiveFetch after each search completes whether enough relevant,
+non-duplicate results have arrived. Once they have, the remaining searches
+are cancelled. If a round of searches ends without enough of them, the
+sources that returned a full page are queried again with a larger page,
+up to max_depth.
+"""
+
+from dedup import deduplicate, normalize_url
+from relevance import rank_results
+
+
+class AdaptiveFetch:
+    def __init__(self, query, target, min_relevance=0.3, max_depth=10, dedup_threshold=0.8, select=None):
+        """
+        Args:
+            query (str): Research query
+            target (int): Relevant unique results that end the fetch
+            min_relevance (float): BM25 relevance (0..1) a result needs to count
+            max_depth (int): Largest page size a source is widened to
+            dedup_threshold (float): Near-duplicate threshold used when counting
+            select (callable): select(results) keeping the results worth
+                analyzing; all results count by default
+        """
+        self.query = query
+        self.target = target
+        self.min_relevance = min_relevance
+        self.max_depth = max_depth
+        self.dedup_threshold = dedup_threshold
+        self.select = select or (lambda results: results)
+
+        # Latest results and page size of every plan index heard from
+        self.results = {}
+        self.depths = {}
+        self.widened = 0
+        self._relevant = None
+
+    def add(self, index, results, depth):
+        """
+        Record the results of plan entry index, searched with page size depth
+
+        A widened page is merged into the source's earlier results by
+        normalized URL, so a wider search that fails (and returns []) keeps
+        the page that already arrived.
+        """
+        merged = list(self.results.get(index, []))
+        seen = {normalize_url(r.get('url')) or r.get('title') for r in merged}
+        for result in results:
+            key = normalize_url(result.get('url')) or result.get('title')
+            if key not in seen:
+                seen.add(key)
+                merged.append(result)
+
+        self.results[index] = merged
+        self.depths[index] = depth
+        self._relevant = None
+
+    def relevant_count(self):
+        """Unique results scoring at least min_relevance"""
+        if self._relevant is None:
+            unique, _ = deduplicate([r for results in self.results.values() for r in results], self.dedup_threshold)
+            relevant, _ = rank_results(self.query, self.select(unique), min_score=self.min_relevance)
+            self._relevant = len(relevant)
+        return self._relevant
+
+    def satisfied(self):
+        """True once target relevant results have arrived"""
+        return self.relevant_count() >= self.target
+
+    def to_widen(self):
+        """
+        Sources worth querying again with a larger page
+
+        Only sources whose last page was full (so more results may exist)
+        and that are still below max_depth are widened, to twice their depth.
+
+        Returns:
+            list: (plan index, new depth) pairs
+        """
+        widen = [
+            (index, min(self.max_depth, depth * 2))
+            for index, depth in sorted(self.depths.items())
+            if depth < self.max_depth and len(self.results[index]) >= depth
+        ]
+        self.widened += len(widen)
+        return widen
+
+    def results_in_plan_order(self):
+        """Every result received, in plan order"""
+        return [r for index in sorted(self.results) for r in self.results[index]]
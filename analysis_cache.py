@@ -0,0 +1,149 @@
+"""
+Persistent cache of LLM analyses for the trusted sources researcher
+
+An analysis is keyed by the model that produced it, the prompt template
+version, the normalized query and a hash of the analyzed content, so the
+same source is only sent to the model once per query.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+def normalize_query(query):
+    """Lowercase a query and collapse its whitespace"""
+    return " ".join(query.lower().split())
+
+
+class AnalysisCache:
+    def __init__(self, path, max_age=30 * 24 * 3600, max_bytes=50 * 1024 * 1024):
+        """
+        Args:
+            path (str): SQLite database file
+            max_age (int): Seconds an analysis is kept, None to keep forever
+            max_bytes (int): Total analysis size kept before least recently
+                used entries are evicted
+        """
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_version INTEGER NOT NULL,
+                query TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS analyses_last_access ON analyses (last_access)")
+        self._db.commit()
+
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        with self._lock:
+            self._evict()
+            self._db.commit()
+
+    def make_key(self, model, prompt_version, query, content):
+        """Cache key for one analysis; the whole content is hashed"""
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        parts = [model, str(prompt_version), normalize_query(query), content_hash]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest(), content_hash
+
+    def get(self, models, prompt_version, query, content):
+        """
+        Find a cached analysis from the first of models that has one
+
+        Returns:
+            tuple: (analysis, model), or (None, None) on a miss
+        """
+        now = time.time()
+        with self._lock:
+            for model in models:
+                key, _ = self.make_key(model, prompt_version, query, content)
+                row = self._db.execute(
+                    "SELECT analysis, created_at FROM analyses WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row is None or (self.max_age and now - row[1] > self.max_age):
+                    continue
+
+                self._db.execute("UPDATE analyses SET last_access = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                self.counters["hits"] += 1
+                return row[0], model
+
+            self.counters["misses"] += 1
+
+        return None, None
+
+    def put(self, model, prompt_version, query, content, analysis):
+        """Store the analysis model produced for content"""
+        key, content_hash = self.make_key(model, prompt_version, query, content)
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, prompt_version, normalize_query(query), content_hash,
+                 analysis, len(analysis.encode("utf-8")), now, now)
+            )
+            self.counters["stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones beyond max_bytes (lock held)"""
+        if self.max_age:
+            cursor = self._db.execute("DELETE FROM analyses WHERE created_at < ?", (time.time() - self.max_age,))
+            self.counters["evictions"] += cursor.rowcount
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._db.execute("SELECT key, size FROM analyses ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM analyses WHERE key = ?", (key,))
+            total -= size
+            self.counters["evictions"] += 1
+
+    def stats(self):
+        """Hit ratio and size of the cache"""
+        with self._lock:
+            counters = dict(self.counters)
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses").fetchone()
+
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_ratio"] = round(counters["hits"] / lookups, 3) if lookups else 0.0
+        counters["entries"] = entries
+        counters["size_bytes"] = size
+        return counters
+
+    def clear(self):
+        """Remove every cached analysis"""
+        with self._lock:
+            self._db.execute("DELETE FROM analyses")
+            self._db.commit()
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,602 @@
+"""
+Async-native trusted sources researcher
+
+AsyncTrustedSourcesResearcher runs the research pipeline on asyncio, with
+httpx for the providers and ollama.AsyncClient for the analyses, so one
+process can serve many concurrent research requests without a thread per
+request. It wraps a TrustedSourcesResearcher (self.researcher) and shares
+its source table, adapters, rate limiter, caches and pipeline helpers;
+only the I/O is reimplemented. Cancelling a task running any of its
+coroutines cancels the outstanding requests and closes open streams.
+"""
+
+import asyncio
+import logging
+import time
+import urllib.parse
+
+import httpx
+import ollama
+
+from adaptive_fetch import AdaptiveFetch
+from chunking import estimate_tokens, context_window, input_budget, split_into_chunks
+from rate_limiter import THROTTLE_STATUSES
+from report_writer import ReportWriter
+from source_registry import run_search_async, SourceError
+from trusted_sources_researcher import TrustedSourcesResearcher
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTrustedSourcesResearcher:
+    def __init__(self, **kwargs):
+        """
+        Takes the same keyword arguments as TrustedSourcesResearcher
+
+        Incremental runs, the local index and batched prompts are only
+        offered by the sync class.
+        """
+        self.researcher = TrustedSourcesResearcher(**kwargs)
+        self.llm = ollama.AsyncClient(host=kwargs.get('ollama_host'))
+
+        self.tracer = self.researcher.tracer
+
+        self._http = None
+        self._llm_slots = asyncio.Semaphore(self.researcher.max_in_flight)
+        self._adapter_slots = {}
+
+    def _client(self):
+        """Shared httpx client, created on first use inside the event loop"""
+        if self._http is None:
+            researcher = self.researcher
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=researcher.pool_connections * researcher.pool_maxsize,
+                    max_keepalive_connections=researcher.pool_maxsize
+                ),
+                # Connection failures only; 429/503 are left to the rate limiter
+                transport=httpx.AsyncHTTPTransport(retries=researcher.max_retries),
+                headers={'Accept-Encoding': 'gzip, deflate'},
+                follow_redirects=True
+            )
+        return self._http
+
+    async def aclose(self):
+        """Close the HTTP client and the shared researcher"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self.researcher.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def _acquire(self, rate_key, priority=0):
+        """Wait for the shared rate limiter without blocking the event loop"""
+        started = time.monotonic()
+        while True:
+            delay = self.researcher.rate_limiter.try_acquire(rate_key, priority, time.monotonic() - started)
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _send(self, url, headers, rate_key, priority, timeout, stream):
+        """Send a request under the rate limiter, retrying throttled answers after backing off"""
+        client = self._client()
+        retries = self.researcher.max_throttle_retries
+        if self.researcher.url_rewriter is not None:
+            url = self.researcher.url_rewriter(url)
+
+        for attempt in range(retries + 1):
+            await self._acquire(rate_key, priority)
+            request = client.build_request('GET', url, headers=headers, timeout=timeout)
+            response = await client.send(request, stream=stream)
+            self.researcher.rate_limiter.update(rate_key, response)
+
+            if response.status_code not in THROTTLE_STATUSES or attempt == retries:
+                return response
+
+            logger.info("⏳ %s answered %s, backing off", rate_key, response.status_code)
+            await response.aclose()
+
+        return response
+
+    def _from_cache(self, cached):
+        """httpx counterpart of a response served by the response cache"""
+        return httpx.Response(
+            cached.status_code,
+            headers=dict(cached.headers),
+            content=cached.content,
+            request=httpx.Request('GET', cached.url)
+        )
+
+    async def _http_get(self, url, headers=None, adapter=None, priority=0, timeout=10, stream=False):
+        """Async counterpart of TrustedSourcesResearcher._http_get"""
+        with self.tracer.span('http', host=urllib.parse.urlsplit(url).netloc) as span:
+            response = await self._get(url, headers, adapter, priority, timeout, stream)
+
+            size = response.headers.get('Content-Length') if stream else len(response.content)
+            span.set(status=response.status_code, bytes=int(size) if size else None)
+            return response
+
+    async def _get(self, url, headers, adapter, priority, timeout, stream):
+        """Body of _http_get, outside the span"""
+        # SQLite calls can wait on the cache's lock, so they run off the event loop
+        cache = self.researcher.response_cache
+        rate_key = adapter.rate_key if adapter else urllib.parse.urlsplit(url).netloc
+
+        if cache is None:
+            return await self._send(url, headers, rate_key, priority, timeout, stream)
+
+        entry = await asyncio.to_thread(cache.get, url, headers)
+        if entry and entry['fresh']:
+            return self._from_cache(await asyncio.to_thread(cache.hit, entry))
+
+        request_headers = dict(headers or {})
+        if entry:
+            request_headers.update(cache.conditional_headers(entry))
+
+        response = await self._send(url, request_headers, rate_key, priority, timeout, stream)
+
+        if response.status_code == 304 and entry:
+            await response.aclose()
+            return self._from_cache(await asyncio.to_thread(cache.hit, entry, revalidated=True))
+
+        if stream:
+            return cache.tee_async(url, headers, response)
+
+        await asyncio.to_thread(cache.put, url, headers, response)
+        return response
+
+    async def search_source(self, key, query, max_results=3, since=None, raise_errors=False):
+        """Search one configured source through its adapter; raise_errors as in TrustedSourcesResearcher.search_source"""
+        adapter = self.researcher.adapters[key]
+        slots = self._adapter_slots.setdefault(key, asyncio.Semaphore(adapter.max_concurrency))
+        error_statuses = []
+
+        async def fetch(request):
+            response = await self._http_get(request.url, request.headers or None, adapter,
+                                            timeout=adapter.timeout, stream=request.stream)
+            if response.status_code >= 400:
+                error_statuses.append(response.status_code)
+            return response
+
+        results = []
+        try:
+            logger.info("🔍 Searching %s for: %s", adapter.name, query)
+            async with slots:
+                with self.tracer.span(f"search:{key}", source=adapter.name) as span:
+                    drain_bytes = adapter.cache_drain_bytes if self.researcher.response_cache else 0
+                    results = await run_search_async(adapter.search(query, max_results, since), fetch, self.tracer,
+                                                     drain_bytes)
+                    span.set(results=len(results))
+
+            if error_statuses and not results:
+                raise SourceError(f"HTTP {error_statuses[-1]}")
+
+            logger.info("✅ Found %s %s results", len(results), adapter.name)
+
+        except Exception as e:
+            logger.error("❌ Error searching %s: %s", adapter.name, e)
+            if raise_errors:
+                raise
+
+        return results
+
+    async def fetch_sources(self, query, categories=['academic', 'general'], max_sources_per_category=2, since=None):
+        """
+        Query every selected source at once
+
+        Returns:
+            tuple: (results in plan order, failures) like TrustedSourcesResearcher.fetch_sources
+        """
+        researcher = self.researcher
+        plan = researcher.build_search_plan(query, categories, max_sources_per_category, since)
+        if not plan:
+            return [], []
+
+        if researcher.adaptive_target:
+            with self.tracer.span('fetch', sources=len(plan)):
+                return await self.fetch_adaptive(plan, query, max_sources_per_category)
+
+        logger.info("⚡ Querying %s sources concurrently...", len(plan))
+        with self.tracer.span('fetch', sources=len(plan)):
+            tasks = [asyncio.create_task(self.search_source(*args, raise_errors=True)) for _, _, _, args in plan]
+
+            try:
+                done, _ = await asyncio.wait(tasks, timeout=researcher.fetch_deadline)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        all_results = []
+        failures = []
+        for (_, name, _, _), task in zip(plan, tasks):
+            if task not in done:
+                failures.append({'source': name, 'error': 'deadline exceeded'})
+            elif task.exception() is not None:
+                failures.append({'source': name, 'error': str(task.exception())})
+            else:
+                all_results.extend(task.result())
+
+        for failure in failures:
+            logger.warning("⚠️ Partial results: %s failed (%s)", failure['source'], failure['error'])
+
+        return all_results, failures
+
+    async def fetch_adaptive(self, plan, query, depth):
+        """Async counterpart of TrustedSourcesResearcher.fetch_adaptive; cancelled searches are cancelled tasks"""
+        researcher = self.researcher
+        controller = AdaptiveFetch(query, researcher.adaptive_target, researcher.adaptive_min_relevance,
+                                   researcher.adaptive_max_depth, researcher.dedup_threshold,
+                                   researcher.select_candidates)
+        budget = researcher.adaptive_time_budget or researcher.fetch_deadline
+        deadline = time.monotonic() + budget if budget else None
+        failures = []
+
+        def submit(index, search_depth):
+            key, _, _, since = plan[index][3]
+            return asyncio.create_task(self.search_source(key, query, search_depth, since, raise_errors=True))
+
+        logger.info("⚡ Querying %s sources concurrently (adaptive, %s relevant results wanted)...",
+                    len(plan), researcher.adaptive_target)
+        pending = {submit(i, depth): (i, depth) for i in range(len(plan))}
+        searches = len(pending)
+        stopped_early = False
+
+        try:
+            while pending:
+                timeout = max(0.0, deadline - time.monotonic()) if deadline else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    for index, _ in pending.values():
+                        if index not in controller.results:
+                            failures.append({'source': plan[index][1], 'error': 'deadline exceeded'})
+                    break
+
+                for task in done:
+                    index, search_depth = pending.pop(task)
+                    if task.exception() is not None:
+                        # A failed wider search keeps the source's earlier page
+                        if not controller.results.get(index):
+                            failures.append({'source': plan[index][1], 'error': str(task.exception())})
+                        controller.add(index, [], search_depth)
+                    else:
+                        controller.add(index, task.result(), search_depth)
+
+                if controller.satisfied():
+                    stopped_early = bool(pending)
+                    if pending:
+                        logger.info("⏹️ %s relevant results; cancelling %s searches",
+                                    controller.relevant_count(), len(pending))
+                    break
+
+                if not pending:
+                    for index, wider in controller.to_widen():
+                        pending[submit(index, wider)] = (index, wider)
+                    if pending:
+                        searches += len(pending)
+                        logger.info("🔎 Only %s relevant results; widening %s sources",
+                                    controller.relevant_count(), len(pending))
+        finally:
+            for task in pending:
+                task.cancel()
+
+        researcher.last_fetch_stats = {
+            'searches': searches,
+            'widened': controller.widened,
+            'cancelled': len(pending),
+            'relevant_results': controller.relevant_count(),
+            'stopped_early': stopped_early
+        }
+
+        for failure in failures:
+            logger.warning("⚠️ Partial results: %s failed (%s)", failure['source'], failure['error'])
+
+        return controller.results_in_plan_order(), failures
+
+    async def get_github_readme(self, repo_full_name):
+        """Async counterpart of TrustedSourcesResearcher.get_github_readme"""
+        readme_url, headers = self.researcher._readme_request(repo_full_name)
+        max_bytes = self.researcher.readme_max_bytes
+
+        try:
+            with self.tracer.span('readme', repository=repo_full_name) as span:
+                response = await self._http_get(readme_url, headers, priority=1, timeout=5, stream=True)
+                try:
+                    if response.status_code not in (200, 206):
+                        return ""
+
+                    raw = b""
+                    async for chunk in response.aiter_bytes(1024):
+                        raw += chunk
+                        if len(raw) >= max_bytes:
+                            break
+                finally:
+                    await response.aclose()
+
+                span.set(bytes=len(raw))
+
+            return self.researcher._readme_text(raw)
+
+        except Exception:
+            return ""
+
+    async def enrich_github_readmes(self, results, time_budget=None):
+        """
+        Append README excerpts to GitHub results within the time budget
+
+        Returns:
+            int: Number of repositories that got a README excerpt
+        """
+        repos = [r for r in results if r.get('source') == 'GitHub' and r.get('full_name') and not r.get('readme_enriched')]
+        if not repos:
+            return 0
+
+        if time_budget is None:
+            time_budget = self.researcher.enrichment_budget
+
+        logger.info("📖 Fetching READMEs for %s GitHub repositories...", len(repos))
+        with self.tracer.span('enrich', repositories=len(repos)) as span:
+            tasks = {asyncio.create_task(self.get_github_readme(r['full_name'])): r for r in repos}
+            try:
+                done, not_done = await asyncio.wait(tasks, timeout=time_budget)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            span.set(missed=len(not_done))
+
+        enriched = 0
+        for task in done:
+            readme_content = task.result()
+            if readme_content:
+                repo = tasks[task]
+                repo['content'] = f"{repo['content']}\n\n{readme_content}"
+                repo['readme_enriched'] = True
+                enriched += 1
+
+        logger.info("📖 Enriched %s of %s repositories within %ss", enriched, len(repos), time_budget)
+        return enriched
+
+    async def _chat(self, model, prompt, on_token=None):
+        """Async counterpart of TrustedSourcesResearcher._chat"""
+        researcher = self.researcher
+        messages = [{"role": "user", "content": prompt}]
+        options = {'num_ctx': context_window(model)}
+        time_to_first_token = None
+
+        async with self._llm_slots:
+            with self.tracer.span('llm', model=model) as span:
+                started = time.monotonic()
+
+                if on_token is None:
+                    final = await self.llm.chat(model=model, messages=messages, options=options,
+                                                keep_alive=researcher.models.keep_alive)
+                    content = final['message']['content']
+                else:
+                    pieces = []
+                    final = {}
+                    stream = await self.llm.chat(model=model, messages=messages, options=options, stream=True,
+                                                 keep_alive=researcher.models.keep_alive)
+                    async for chunk in stream:
+                        text = chunk['message']['content']
+                        if text:
+                            if time_to_first_token is None:
+                                time_to_first_token = time.monotonic() - started
+                            pieces.append(text)
+                            on_token(text)
+                        if chunk.get('done'):
+                            final = chunk
+                    content = "".join(pieces)
+
+                latency = time.monotonic() - started
+
+                reply = researcher._record_chat(model, content, final, latency, time_to_first_token)
+                span.set(prompt_tokens=reply['prompt_eval_count'], completion_tokens=reply['eval_count'],
+                         time_to_first_token=time_to_first_token)
+
+        return reply
+
+    async def _candidates(self):
+        """Healthy models, best first; probing Ollama blocks, so it runs off the event loop"""
+        return await asyncio.to_thread(self.researcher.models.candidates)
+
+    async def _complete(self, prompt, on_token=None):
+        """Async counterpart of TrustedSourcesResearcher._complete, including the on_token(None) reset"""
+        models = self.researcher.models
+        streamed = False
+
+        def forward(text):
+            nonlocal streamed
+            streamed = True
+            on_token(text)
+
+        for model in await self._candidates():
+            if streamed:
+                on_token(None)
+                streamed = False
+
+            try:
+                response = await self._chat(model, prompt, forward if on_token else None)
+            except ConnectionError as e:
+                # Ollama itself is unreachable, so no other model will work either
+                logger.error("❌ Ollama is not reachable: %s", e)
+                break
+            except Exception as e:
+                models.record_failure(model, e)
+                continue
+
+            models.record_success(model)
+            return response['content'], model
+
+        if streamed:
+            on_token(None)
+        return None, None
+
+    async def _condense(self, content, query, budget):
+        """Map step for a long content: condense its chunks concurrently until the notes fit budget"""
+        researcher = self.researcher
+        text = content
+
+        while estimate_tokens(text) > budget:
+            chunks = split_into_chunks(text, budget)
+            logger.info("🧩 Condensing %s chunks of a long source", len(chunks))
+
+            replies = await asyncio.gather(*[
+                self._complete(researcher._condense_prompt(n, len(chunks), chunk, query))
+                for n, chunk in enumerate(chunks, 1)
+            ])
+
+            text, done = researcher._combine_notes(text, [note for note, _ in replies], budget)
+            if done:
+                return text
+
+        return text
+
+    async def analyze(self, content, query, on_token=None):
+        """
+        Analyze one content
+
+        Returns:
+            tuple: (analysis, model); model is None for the plain summary fallback
+        """
+        researcher = self.researcher
+
+        analysis, model = await asyncio.to_thread(researcher._cached_analysis, content, query)
+        if analysis is not None:
+            if on_token:
+                on_token(analysis)
+            return analysis, model
+
+        candidates = await self._candidates()
+        budget = input_budget(candidates[0] if candidates else researcher.model_name)
+
+        text = content
+        if estimate_tokens(content) > budget:
+            text = await self._condense(content, query, budget)
+
+        analysis, model = None, None
+        if text is not None:
+            analysis, model = await self._complete(researcher._analysis_prompt(text, query), on_token)
+
+        if analysis is None:
+            analysis = f"Content summary: {content[:300]}..."
+            if on_token:
+                on_token(analysis)
+            return analysis, None
+
+        await asyncio.to_thread(researcher._store_analysis, content, query, analysis, model)
+        return analysis, model
+
+    async def iter_analyses(self, candidates, query):
+        """
+        Analyze candidates concurrently (up to max_in_flight requests at once)
+
+        Yields:
+            tuple: (index in candidates, analyzed record), as each analysis finishes
+        """
+        researcher = self.researcher
+
+        async def run(index):
+            analysis, model = await self.analyze(candidates[index]['content'], query)
+            return index, researcher._make_analyzed_record(candidates[index], analysis, model)
+
+        logger.info("🤖 Analyzing %s sources...", len(candidates))
+        tasks = [asyncio.create_task(run(i)) for i in range(len(candidates))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, record = await next_done
+                logger.info("✅ Analyzed: %s...", record['title'][:50])
+                yield index, record
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _candidates_for(self, query, categories, max_sources_per_category, since=None):
+        """Fetch, deduplicate, rank and enrich: the candidates worth analyzing, and the fetch failures"""
+        researcher = self.researcher
+
+        results, failures = await self.fetch_sources(query, categories, max_sources_per_category, since)
+        results = researcher.deduplicate_results(results)
+        candidates = researcher.select_candidates(results, query)
+
+        # Only repositories that are going to be analyzed get README excerpts
+        await self.enrich_github_readmes(candidates)
+        return candidates, failures
+
+    async def iter_results(self, query, categories=['academic', 'general'], max_sources_per_category=2, since=None):
+        """
+        Run the research pipeline, yielding analyzed records as they are ready
+
+        Nothing is written to disk. Use as `async for record in researcher.iter_results(query)`.
+        """
+        candidates, _ = await self._candidates_for(query, categories, max_sources_per_category, since)
+
+        analyses = self.iter_analyses(candidates, query)
+        try:
+            async for _, record in analyses:
+                yield record
+        finally:
+            await analyses.aclose()
+
+    async def conduct_research(self, query, categories=['academic', 'general'], max_sources_per_category=2, on_result=None):
+        """
+        Async counterpart of TrustedSourcesResearcher.conduct_research
+
+        Args:
+            query (str): Research query
+            categories (list): Categories to search in
+            max_sources_per_category (int): Max sources per category
+            on_result (callable): Called with each analyzed record as soon as it is ready
+
+        Returns:
+            str: The report text, or None if no suitable sources were found
+        """
+        with self.tracer.span('research', query=query):
+            return await self._conduct_research(query, categories, max_sources_per_category, on_result)
+
+    async def _conduct_research(self, query, categories, max_sources_per_category, on_result):
+        """Body of conduct_research, inside the 'research' span"""
+        researcher = self.researcher
+        logger.info("🚀 Starting trusted source research for: %s", query)
+        logger.info("=" * 60)
+
+        candidates, failures = await self._candidates_for(query, categories, max_sources_per_category)
+        if not candidates:
+            logger.error("❌ No suitable sources found.")
+            return None
+
+        timestamp, report_filename, data_filename = researcher._output_paths()
+        logger.info("📝 Writing report to: %s", report_filename)
+
+        analyzed = [None] * len(candidates)
+        with open(report_filename, 'w', encoding='utf-8') as f:
+            writer = ReportWriter(f, query, candidates)
+            writer.write_header()
+
+            with self.tracer.span('analyze', sources=len(candidates)):
+                analyses = self.iter_analyses(candidates, query)
+                try:
+                    async for index, record in analyses:
+                        analyzed[index] = record
+                        writer.add_finding(index, record)
+                        if on_result:
+                            on_result(record)
+                finally:
+                    await analyses.aclose()
+
+            with self.tracer.span('report', sources=len(analyzed)):
+                writer.finish(analyzed)
+
+        logger.info("💾 Report saved as: %s", report_filename)
+        # Saving takes the results store's file lock and writes the index
+        await asyncio.to_thread(researcher.save_data, query, timestamp, data_filename, analyzed, failures,
+                                report_filename)
+
+        logger.info("✅ Research completed! Found %s quality sources.", len(analyzed))
+        with open(report_filename, 'r', encoding='utf-8') as f:
+            return f.read()
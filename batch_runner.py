@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Batch query runner for the trusted sources researcher
+
+Queries from a JSONL or CSV file are loaded into a SQLite job queue and run
+through three checkpointed stages: fetch, analyze and report. Several
+queries run at once on one shared researcher, so they share its rate
+limits and LLM concurrency limit. After a crash or restart, running the
+batch again resumes every job at the stage it had reached.
+
+Usage:
+    python batch_runner.py queries.jsonl --db batch_jobs.sqlite3 --workers 2
+    python batch_runner.py --db batch_jobs.sqlite3 --status
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from trusted_sources_researcher import TrustedSourcesResearcher
+
+logger = logging.getLogger(__name__)
+
+STAGES = ['fetch', 'analyze', 'report']
+DEFAULT_CATEGORIES = ['academic', 'general']
+
+
+def load_queries(path):
+    """
+    Read query specs from a JSONL or CSV file
+
+    JSONL lines are objects with "query" and optional "categories" (list)
+    and "max_sources_per_category". CSV files need a "query" column and may
+    have "categories" (separated by ';') and "max_sources_per_category".
+
+    Returns:
+        list: {'query', 'categories', 'max_sources_per_category'} dicts
+    """
+    specs = []
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(f))
+            for row in rows:
+                row['categories'] = [c.strip() for c in (row.get('categories') or '').split(';') if c.strip()]
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    for row in rows:
+        query = (row.get('query') or '').strip()
+        if not query:
+            continue
+
+        specs.append({
+            'query': query,
+            'categories': row.get('categories') or DEFAULT_CATEGORIES,
+            'max_sources_per_category': int(row.get('max_sources_per_category') or 2)
+        })
+
+    return specs
+
+
+class BatchRunner:
+    def __init__(self, researcher, db_path="batch_jobs.sqlite3", max_attempts=3, batch_analysis=False):
+        """
+        Args:
+            researcher (TrustedSourcesResearcher): Shared by every job
+            db_path (str): SQLite job queue
+            max_attempts (int): Failures of one stage before the job is marked failed
+            batch_analysis (bool): Pack short sources into shared analysis prompts
+        """
+        self.researcher = researcher
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.batch_analysis = batch_analysis
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query TEXT NOT NULL,
+                categories TEXT NOT NULL,
+                max_sources INTEGER NOT NULL,
+                stage TEXT NOT NULL DEFAULT 'fetch',
+                candidates TEXT,
+                failures TEXT,
+                analyzed TEXT,
+                report_file TEXT,
+                data_file TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                UNIQUE (query, categories, max_sources)
+            )
+        """)
+        self._db.commit()
+
+    def add_queries(self, specs):
+        """Queue query specs; ones already queued (finished or not) are skipped"""
+        added = 0
+        with self._lock:
+            for spec in specs:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO jobs (query, categories, max_sources, updated_at) VALUES (?, ?, ?, ?)",
+                    (spec['query'], json.dumps(spec['categories']), spec['max_sources_per_category'], time.time())
+                )
+                added += cursor.rowcount
+            self._db.commit()
+
+        logger.info("📥 Queued %s new queries (%s already in the queue)", added, len(specs) - added)
+        return added
+
+    def add_file(self, path):
+        """Queue every query of a JSONL/CSV file"""
+        return self.add_queries(load_queries(path))
+
+    def _pending_jobs(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE stage IN ('fetch', 'analyze', 'report') ORDER BY id"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _load(self, job_id):
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            columns = [c[0] for c in cursor.description]
+            return dict(zip(columns, cursor.fetchone()))
+
+    def _checkpoint(self, job_id, **fields):
+        """Persist a job's progress"""
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", list(fields.values()) + [job_id])
+            self._db.commit()
+
+    def run_job(self, job_id):
+        """Run one job from its current stage to the end, checkpointing after each stage"""
+        job = self._load(job_id)
+        query = job['query']
+        researcher = self.researcher
+
+        try:
+            if job['stage'] == 'fetch':
+                logger.info("🚀 [%s] Fetching: %s", job_id, query)
+                results, failures = researcher.fetch_sources(
+                    query, json.loads(job['categories']), job['max_sources'], concurrent=True
+                )
+                results = researcher.deduplicate_results(results)
+                candidates = researcher.select_candidates(results, query)
+                researcher.enrich_github_readmes(candidates)
+
+                self._checkpoint(job_id, stage='analyze', candidates=json.dumps(candidates),
+                                 failures=json.dumps(failures), attempts=0, error=None)
+                job = self._load(job_id)
+
+            if job['stage'] == 'analyze':
+                logger.info("🤖 [%s] Analyzing: %s", job_id, query)
+                analyzed = researcher.analyze_sources(json.loads(job['candidates']), query, batch=self.batch_analysis)
+
+                self._checkpoint(job_id, stage='report', analyzed=json.dumps(analyzed), attempts=0, error=None)
+                job = self._load(job_id)
+
+            if job['stage'] == 'report':
+                analyzed = json.loads(job['analyzed'])
+                if analyzed:
+                    report_file, data_file = researcher.write_report(query, analyzed, json.loads(job['failures']))
+                else:
+                    logger.error("❌ [%s] No suitable sources found for: %s", job_id, query)
+                    report_file, data_file = None, None
+
+                self._checkpoint(job_id, stage='done', report_file=report_file, data_file=data_file,
+                                 attempts=0, error=None)
+                logger.info("✅ [%s] Done: %s", job_id, query)
+
+        except Exception as e:
+            attempts = job['attempts'] + 1
+            stage = 'failed' if attempts >= self.max_attempts else job['stage']
+            self._checkpoint(job_id, stage=stage, attempts=attempts, error=str(e))
+            logger.error("❌ [%s] %s stage failed (%s/%s): %s", job_id, job['stage'], attempts, self.max_attempts, e)
+
+    def run(self, max_concurrent_queries=2):
+        """
+        Run every unfinished job, several queries at a time
+
+        Jobs that fail are retried on later runs until they reach max_attempts.
+        """
+        job_ids = self._pending_jobs()
+        logger.info("📋 %s jobs to run with %s concurrent queries", len(job_ids), max_concurrent_queries)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrent_queries)) as executor:
+            list(executor.map(self.run_job, job_ids))
+
+        elapsed = time.monotonic() - started
+        logger.info("🏁 Batch finished in %.1fs", elapsed)
+        return self.status()
+
+    def status(self):
+        """Number of jobs in each stage"""
+        with self._lock:
+            rows = self._db.execute("SELECT stage, COUNT(*) FROM jobs GROUP BY stage").fetchall()
+        return dict(rows)
+
+    def failed_jobs(self):
+        """(query, error) for every job that gave up"""
+        with self._lock:
+            return self._db.execute("SELECT query, error FROM jobs WHERE stage = 'failed' ORDER BY id").fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a file of research queries through a resumable job queue")
+    parser.add_argument("queries", nargs="?", help="JSONL or CSV file of queries to add to the queue")
+    parser.add_argument("--db", default="batch_jobs.sqlite3", help="SQLite job queue (default: batch_jobs.sqlite3)")
+    parser.add_argument("--workers", type=int, default=2, help="Queries run concurrently (default: 2)")
+    parser.add_argument("--model", default="tinyllama", help="Preferred Ollama model")
+    parser.add_argument("--max-in-flight", type=int, default=2, help="Concurrent LLM requests across all queries")
+    parser.add_argument("--cache-dir", default=".research_cache", help="Response and analysis cache directory")
+    parser.add_argument("--output-dir", default=".", help="Where reports and data files are written")
+    parser.add_argument("--store-dir", help="Append run data to this results store instead of JSON files")
+    parser.add_argument("--adaptive-target", type=int,
+                        help="Stop each fetch once this many relevant results have arrived")
+    parser.add_argument("--batch-analysis", action="store_true", help="Pack short sources into shared prompts")
+    parser.add_argument("--trace", help="Write a Chrome trace of the run's stages to this file")
+    parser.add_argument("--quiet", action="store_true", help="Only log warnings and errors")
+    parser.add_argument("--status", action="store_true", help="Only print the queue status")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
+
+    if args.status:
+        runner = BatchRunner(None, args.db)
+        print(runner.status())
+        for query, error in runner.failed_jobs():
+            print(f"❌ {query}: {error}")
+        runner.close()
+        return
+
+    with TrustedSourcesResearcher(model_name=args.model, max_in_flight=args.max_in_flight,
+                                  cache_dir=args.cache_dir, output_dir=args.output_dir,
+                                  store_dir=args.store_dir, trace=bool(args.trace),
+                                  adaptive_target=args.adaptive_target) as researcher:
+        runner = BatchRunner(researcher, args.db, batch_analysis=args.batch_analysis)
+        if args.queries:
+            if not os.path.exists(args.queries):
+                parser.error(f"queries file not found: {args.queries}")
+            runner.add_file(args.queries)
+
+        print(runner.run(args.workers))
+        runner.close()
+
+        if args.trace:
+            researcher.tracer.export_chrome_trace(args.trace)
+
+
+if __name__ == "__main__":
+    main()
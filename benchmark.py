@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+Offline replay benchmark for the trusted sources researcher
+
+`record` runs the fetch stage of every query in a corpus against the live
+providers and saves each response (arXiv, Semantic Scholar, Wikipedia,
+GitHub, Reddit, ...) as a fixture. `run` replays the fixtures from a local
+stub HTTP server, answers the analyses from a stub Ollama endpoint with
+configurable latency and jitter, and reports end-to-end and per-stage
+timings, queries/min and peak memory. No network or real model is needed,
+so concurrency, caching and parsing changes can be compared run to run.
+
+Usage:
+    python benchmark.py record queries.jsonl --fixtures bench_fixtures
+    python benchmark.py run --fixtures bench_fixtures --llm-latency 0.5 --llm-jitter 0.2 --output bench.json
+    python benchmark.py run --fixtures bench_fixtures --baseline bench.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch_runner import load_queries
+from trusted_sources_researcher import TrustedSourcesResearcher
+
+logger = logging.getLogger(__name__)
+
+# Response headers kept in fixtures; bodies are stored decoded, so the
+# encoding and length headers of the original response don't apply
+FIXTURE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Expires')
+
+# Metrics compared against a baseline, and whether higher is better
+COMPARED_METRICS = {
+    'seconds': False,
+    'queries_per_min': True,
+    'query_p50': False,
+    'query_p95': False,
+    'peak_rss_kb': False
+}
+
+# Stage averages must also grow by this many seconds to count as a
+# regression, so sub-millisecond stages don't flag noise
+MIN_STAGE_DELTA = 0.005
+
+
+class FixtureStore:
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Holds manifest.json, responses.jsonl and bodies/
+        """
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.responses_path = os.path.join(directory, "responses.jsonl")
+        self.bodies_dir = os.path.join(directory, "bodies")
+
+        self._lock = threading.Lock()
+        self._responses = {}
+        if os.path.exists(self.responses_path):
+            with open(self.responses_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses[entry['url']] = entry
+
+    def __len__(self):
+        return len(self._responses)
+
+    def add(self, url, response):
+        """Save a fully read requests.Response as the fixture for url"""
+        body = response.content
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:24]
+        entry = {
+            'url': url,
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in FIXTURE_HEADERS if name in response.headers},
+            'body': f"{digest}.bin"
+        }
+
+        with self._lock:
+            os.makedirs(self.bodies_dir, exist_ok=True)
+            with open(os.path.join(self.bodies_dir, entry['body']), 'wb') as f:
+                f.write(body)
+            with open(self.responses_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+            self._responses[url] = entry
+
+    def get(self, url):
+        """(status, headers, body) recorded for url, or None"""
+        with self._lock:
+            entry = self._responses.get(url)
+        if entry is None:
+            return None
+
+        # Bodies are read per request, so the server holds none in memory
+        with open(os.path.join(self.bodies_dir, entry['body']), 'rb') as f:
+            return entry['status'], entry['headers'], f.read()
+
+    def save_manifest(self, specs):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'recorded_at': datetime.now(timezone.utc).isoformat(),
+                'queries': specs
+            }, f, indent=2, ensure_ascii=False)
+
+    def queries(self):
+        """Query specs the fixtures were recorded for"""
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)['queries']
+
+
+class _RecordingResearcher(TrustedSourcesResearcher):
+    """Researcher that saves every provider response it receives"""
+
+    def __init__(self, fixtures, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures = fixtures
+
+    def _send(self, session, url, headers, rate_key, priority, **kwargs):
+        # Whole bodies are read so they can be saved; streamed reads are
+        # served from the loaded content
+        kwargs['stream'] = False
+        response = super()._send(session, url, headers, rate_key, priority, **kwargs)
+        self.fixtures.add(url, response)
+        return response
+
+
+def record(specs, fixtures_dir):
+    """
+    Fetch every query spec from the live providers into fixtures
+
+    Only the fetch stage runs (with GitHub README enrichment), so Ollama
+    isn't needed.
+
+    Returns:
+        FixtureStore: The recorded fixtures
+    """
+    fixtures = FixtureStore(fixtures_dir)
+    with _RecordingResearcher(fixtures, output_dir=tempfile.gettempdir()) as researcher:
+        for spec in specs:
+            results, _ = researcher.fetch_sources(spec['query'], spec['categories'],
+                                                  spec['max_sources_per_category'], concurrent=True)
+            researcher.enrich_github_readmes(results)
+
+    fixtures.save_manifest(specs)
+    return fixtures
+
+
+def _delay(rng, latency, jitter):
+    """latency +/- a uniform jitter, never negative"""
+    return max(0.0, latency + rng.uniform(-jitter, jitter))
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients abandon streamed bodies and cancelled requests on purpose
+        pass
+
+
+class StubServer:
+    """A ThreadingHTTPServer on 127.0.0.1 running in a daemon thread"""
+
+    def __init__(self, handler):
+        self.server = _QuietServer(('127.0.0.1', 0), handler)
+        self.server.stub = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ReplayHandler(_QuietHandler):
+    def do_GET(self):
+        stub = self.server.stub
+        url = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get('url', [''])[0]
+        fixture = stub.fixtures.get(url)
+
+        with stub.lock:
+            stub.requests += 1
+            if fixture is None:
+                stub.misses.append(url)
+            delay = _delay(stub.rng, stub.latency, stub.jitter)
+
+        time.sleep(delay)
+        if fixture is None:
+            self._reply(404, b'{"error": "no fixture"}', {'Content-Type': 'application/json'})
+        else:
+            status, headers, body = fixture
+            self._reply(status, body, headers)
+
+
+class ReplayServer(StubServer):
+    """Serves recorded fixtures; use rewrite() as the researcher's url_rewriter"""
+
+    def __init__(self, fixtures, latency=0.0, jitter=0.0, seed=0):
+        super().__init__(_ReplayHandler)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.misses = []
+
+    def rewrite(self, url):
+        return f"{self.url}/replay?url={urllib.parse.quote(url, safe='')}"
+
+
+class _OllamaHandler(_QuietHandler):
+    def _json(self, data):
+        self._reply(200, json.dumps(data).encode('utf-8'), {'Content-Type': 'application/json'})
+
+    def do_GET(self):
+        stub = self.server.stub
+        if self.path == '/api/tags':
+            self._json({'models': [{'name': model, 'model': model} for model in stub.models]})
+        elif self.path == '/api/ps':
+            self._json({'models': [{'name': model, 'model': model} for model in stub.models]})
+        else:
+            self._reply(404, b'{"error": "not found"}', {'Content-Type': 'application/json'})
+
+    def do_POST(self):
+        stub = self.server.stub
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+
+        if self.path == '/api/generate':
+            self._json({'model': request.get('model'), 'response': '', 'done': True})
+        elif self.path == '/api/chat':
+            self._chat(stub, request)
+        else:
+            self._reply(404, b'{"error": "not found"}', {'Content-Type': 'application/json'})
+
+    def _chat(self, stub, request):
+        prompt = "".join(message.get('content', '') for message in request.get('messages', []))
+        reply = stub.reply_for(prompt)
+        pieces = re.findall(r'\S+\s*', reply) or [reply]
+        prompt_tokens, reply_tokens = max(1, len(prompt) // 4), max(1, len(reply) // 4)
+
+        with stub.lock:
+            stub.requests += 1
+            delay = _delay(stub.rng, stub.latency, stub.jitter)
+        generation = reply_tokens / stub.tokens_per_sec if stub.tokens_per_sec else 0.0
+
+        def message(content, done):
+            data = {'model': request.get('model'), 'created_at': datetime.now(timezone.utc).isoformat(),
+                    'message': {'role': 'assistant', 'content': content}, 'done': done}
+            if done:
+                data.update(done_reason='stop', prompt_eval_count=prompt_tokens, eval_count=reply_tokens)
+            return data
+
+        # Like Ollama, the stub runs a limited number of requests at once
+        with stub.slots:
+            time.sleep(delay)
+
+            if not request.get('stream', True):
+                time.sleep(generation)
+                self._json(message(reply, True))
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for piece in pieces:
+                time.sleep(generation / len(pieces))
+                self._chunk(json.dumps(message(piece, False)) + "\n")
+            self._chunk(json.dumps(message('', True)) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+class StubOllama(StubServer):
+    """Answers /api/chat with canned analyses after a configurable delay"""
+
+    def __init__(self, models=("tinyllama:latest",), latency=0.5, jitter=0.0, tokens_per_sec=None,
+                 parallel=1, seed=0):
+        """
+        Args:
+            models (tuple): Models reported as installed and loaded
+            latency (float): Seconds before the first token of every reply
+            jitter (float): Latency varies uniformly by up to this many seconds
+            tokens_per_sec (float): Generation speed after the first token (None: instant)
+            parallel (int): Requests served at once, like OLLAMA_NUM_PARALLEL
+            seed (int): Seed for the jitter, so runs are repeatable
+        """
+        super().__init__(_OllamaHandler)
+        self.models = list(models)
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.slots = threading.BoundedSemaphore(max(1, parallel))
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def reply_for(self, prompt):
+        """Canned reply, with one '### SOURCE n' section per source of a batched prompt"""
+        sources = re.findall(r'^\s*\[SOURCE (\d+)\]', prompt, flags=re.MULTILINE)
+        analysis = ("Key insights: the source describes methods and results relevant to the query. "
+                    "Facts: it reports measurements and compares them with earlier work. "
+                    "Relation: it addresses the query directly.")
+        if sources:
+            return "\n\n".join(f"### SOURCE {n}\n{analysis}" for n in sources)
+        return analysis
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_benchmark(specs, fixtures, workers=1, repeat=1, cache=False, batch=False, max_in_flight=2,
+                  rate_limits=False, http_latency=0.0, http_jitter=0.0, llm_latency=0.5, llm_jitter=0.0,
+                  llm_tokens_per_sec=None, llm_parallel=1, trace_memory=False, seed=0, trace_file=None,
+                  adaptive_target=None):
+    """
+    Replay the query corpus against the stub servers
+
+    Each repeat builds a fresh researcher; with cache=True the response and
+    analysis caches persist across repeats, so repeats after the first
+    measure warm caches.
+
+    Returns:
+        dict: {'config': ..., 'runs': [per-repeat metrics]}
+    """
+    config = {key: value for key, value in locals().items() if key not in ('specs', 'fixtures', 'trace_file')}
+    config['queries'] = len(specs)
+    work_dir = tempfile.mkdtemp(prefix="benchmark_")
+    runs = []
+
+    try:
+        with ReplayServer(fixtures, http_latency, http_jitter, seed) as replay, \
+                StubOllama(latency=llm_latency, jitter=llm_jitter, tokens_per_sec=llm_tokens_per_sec,
+                           parallel=llm_parallel, seed=seed) as ollama_stub:
+            for n in range(repeat):
+                output_dir = os.path.join(work_dir, f"run{n}")
+                researcher = TrustedSourcesResearcher(
+                    max_in_flight=max_in_flight, output_dir=output_dir,
+                    cache_dir=os.path.join(work_dir, "cache") if cache else None,
+                    ollama_host=ollama_stub.url, url_rewriter=replay.rewrite,
+                    trace=True, trace_memory=trace_memory, adaptive_target=adaptive_target
+                )
+                if not rate_limits:
+                    for adapter in researcher.adapters.values():
+                        researcher.rate_limiter.configure(adapter.rate_key, None)
+                    researcher.rate_limiter.configure("api.github.com", None)
+
+                runs.append(_timed_run(researcher, specs, workers, batch, replay, ollama_stub))
+                if trace_file:
+                    root, ext = os.path.splitext(trace_file)
+                    researcher.tracer.export_chrome_trace(f"{root}_{n}{ext}" if repeat > 1 else trace_file)
+                researcher.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {'config': config, 'runs': runs}
+
+
+def _timed_run(researcher, specs, workers, batch, replay, ollama_stub):
+    """Run every spec once and collect the metrics"""
+    http_before, llm_before, misses_before = replay.requests, ollama_stub.requests, len(replay.misses)
+    query_seconds = []
+    failed = 0
+
+    def run_query(spec):
+        started = time.perf_counter()
+        report = researcher.conduct_research(spec['query'], spec['categories'], spec['max_sources_per_category'],
+                                             concurrent=True, batch=batch)
+        return time.perf_counter() - started, report is not None
+
+    if researcher.tracer.memory:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for seconds, ok in executor.map(run_query, specs):
+            query_seconds.append(seconds)
+            failed += not ok
+    elapsed = time.perf_counter() - started
+
+    metrics = {
+        'seconds': round(elapsed, 3),
+        'queries_per_min': round(len(specs) / elapsed * 60, 2),
+        'query_p50': round(_percentile(query_seconds, 0.5), 3),
+        'query_p95': round(_percentile(query_seconds, 0.95), 3),
+        'query_max': round(max(query_seconds, default=0.0), 3),
+        'failed_queries': failed,
+        'stages': researcher.tracer.summary(),
+        'http_requests': replay.requests - http_before,
+        'fixture_misses': len(replay.misses) - misses_before,
+        'llm_requests': ollama_stub.requests - llm_before,
+        # ru_maxrss is in kilobytes on Linux and never goes down, so later
+        # repeats report the peak so far
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+    if researcher.tracer.memory:
+        metrics['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+    return metrics
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compare the last run of results with the last run of baseline
+
+    Returns:
+        list: (metric, baseline value, new value, change, regressed) tuples
+    """
+    new, old = results['runs'][-1], baseline['runs'][-1]
+    rows = []
+
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        if metric in old and metric in new and old[metric]:
+            change = (new[metric] - old[metric]) / old[metric]
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            rows.append((metric, old[metric], new[metric], round(change, 3), regressed))
+
+    for stage, stats in new['stages'].items():
+        old_stats = old['stages'].get(stage)
+        if old_stats and old_stats['avg']:
+            change = (stats['avg'] - old_stats['avg']) / old_stats['avg']
+            regressed = change > tolerance and stats['avg'] - old_stats['avg'] > MIN_STAGE_DELTA
+            rows.append((f"stage {stage} avg", old_stats['avg'], stats['avg'], round(change, 3), regressed))
+
+    return rows
+
+
+def print_results(results):
+    for n, run in enumerate(results['runs']):
+        print(f"Run {n}: {run['seconds']}s, {run['queries_per_min']} queries/min, "
+              f"p50 {run['query_p50']}s, p95 {run['query_p95']}s, peak RSS {run['peak_rss_kb']} KB, "
+              f"{run['http_requests']} HTTP ({run['fixture_misses']} without fixture), "
+              f"{run['llm_requests']} LLM requests")
+        for stage, stats in sorted(run['stages'].items(), key=lambda item: -item[1]['total']):
+            print(f"    {stage:<24} {stats['count']:>5}x  total {stats['total']:>8.3f}s  "
+                  f"avg {stats['avg']:>7.4f}s  max {stats['max']:>7.4f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record provider fixtures and replay them as an offline benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Fetch a query corpus from the live providers into fixtures")
+    record_parser.add_argument("queries", help="JSONL or CSV file of queries (same format as batch_runner.py)")
+    record_parser.add_argument("--fixtures", default="bench_fixtures", help="Fixture directory (default: bench_fixtures)")
+    record_parser.add_argument("--categories", help="Categories to record for every query, separated by ',' "
+                                                    "(default: each query's own)")
+
+    run_parser = commands.add_parser("run", help="Replay the fixtures and report timings")
+    run_parser.add_argument("--fixtures", default="bench_fixtures", help="Fixture directory (default: bench_fixtures)")
+    run_parser.add_argument("--queries", help="Query file to replay instead of the recorded corpus")
+    run_parser.add_argument("--workers", type=int, default=1, help="Queries run concurrently (default: 1)")
+    run_parser.add_argument("--repeat", type=int, default=1, help="Times the corpus is replayed (default: 1)")
+    run_parser.add_argument("--cache", action="store_true", help="Keep response and analysis caches across repeats")
+    run_parser.add_argument("--batch-analysis", action="store_true", help="Pack short sources into shared prompts")
+    run_parser.add_argument("--max-in-flight", type=int, default=2, help="Concurrent LLM requests (default: 2)")
+    run_parser.add_argument("--adaptive-target", type=int, help="Stop fetching at this many relevant results")
+    run_parser.add_argument("--rate-limits", action="store_true", help="Keep the provider rate limits (off by default)")
+    run_parser.add_argument("--http-latency", type=float, default=0.0, help="Seconds added to every provider response")
+    run_parser.add_argument("--http-jitter", type=float, default=0.0, help="Uniform +/- jitter on the provider latency")
+    run_parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds before each LLM reply (default: 0.5)")
+    run_parser.add_argument("--llm-jitter", type=float, default=0.0, help="Uniform +/- jitter on the LLM latency")
+    run_parser.add_argument("--llm-tokens-per-sec", type=float, help="Simulated generation speed (default: instant)")
+    run_parser.add_argument("--llm-parallel", type=int, default=1, help="Requests the stub Ollama serves at once (default: 1)")
+    run_parser.add_argument("--trace-memory", action="store_true", help="Also record tracemalloc peaks (slower)")
+    run_parser.add_argument("--seed", type=int, default=0, help="Seed for the jitter")
+    run_parser.add_argument("--trace", help="Write a Chrome trace of each repeat to this file")
+    run_parser.add_argument("--output", help="Write the results as JSON to this file")
+    run_parser.add_argument("--baseline", help="Results JSON of an earlier run to compare with")
+    run_parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change counted as a regression (default: 0.1)")
+    run_parser.add_argument("--verbose", action="store_true", help="Show the researcher's progress log")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        specs = load_queries(args.queries)
+        if args.categories:
+            for spec in specs:
+                spec['categories'] = args.categories.split(',')
+
+        fixtures = record(specs, args.fixtures)
+        print(f"📼 Recorded {len(fixtures)} responses for {len(specs)} queries into {args.fixtures}")
+        return
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+    fixtures = FixtureStore(args.fixtures)
+    specs = load_queries(args.queries) if args.queries else fixtures.queries()
+
+    results = run_benchmark(
+        specs, fixtures, workers=args.workers, repeat=args.repeat, cache=args.cache, batch=args.batch_analysis,
+        max_in_flight=args.max_in_flight, rate_limits=args.rate_limits,
+        http_latency=args.http_latency, http_jitter=args.http_jitter,
+        llm_latency=args.llm_latency, llm_jitter=args.llm_jitter, llm_tokens_per_sec=args.llm_tokens_per_sec,
+        llm_parallel=args.llm_parallel, trace_memory=args.trace_memory, seed=args.seed, trace_file=args.trace,
+        adaptive_target=args.adaptive_target
+    )
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        regressions = 0
+        for metric, old, new, change, regressed in compare(results, baseline, args.tolerance):
+            regressions += regressed
+            print(f"{'❌' if regressed else '✅'} {metric}: {old} -> {new} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Token-aware chunking for the trusted sources researcher
+
+Prompts are sized for the context window of the model they go to. Long
+contents are split into chunks on sentence and paragraph boundaries for
+map-reduce summarization; short contents are packed together so one
+prompt fills the window instead of leaving most of it unused.
+"""
+
+import re
+
+# Context windows (tokens) the researcher asks Ollama for, by model name
+# without tag. Ollama defaults to 2048 unless num_ctx is passed.
+MODEL_CONTEXT_WINDOWS = {
+    "tinyllama": 2048,
+    "phi": 2048,
+    "mistral": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 2048
+
+# Tokens kept free for the prompt instructions and for the reply
+PROMPT_OVERHEAD_TOKENS = 200
+REPLY_TOKENS = 400
+
+
+def estimate_tokens(text):
+    """Rough token count for English text (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def context_window(model):
+    """Context window used for model"""
+    return MODEL_CONTEXT_WINDOWS.get((model or '').split(':')[0], DEFAULT_CONTEXT_WINDOW)
+
+
+def input_budget(model):
+    """Tokens of source text that fit in one prompt to model"""
+    return max(256, context_window(model) - PROMPT_OVERHEAD_TOKENS - REPLY_TOKENS)
+
+
+def split_into_chunks(text, max_tokens):
+    """
+    Split text into chunks of at most max_tokens tokens
+
+    Chunks end on paragraph or sentence boundaries where possible; a single
+    sentence longer than a chunk is cut by length.
+
+    Returns:
+        list: Chunk texts, in order
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    max_chars = max_tokens * 4
+    pieces = []
+    for sentence in re.split(r'(?<=[.!?])\s+|\n{2,}', text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if sentence:
+            pieces.append(sentence)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
+def pack(token_counts, budget):
+    """
+    Group consecutive items into batches whose token counts fit budget
+
+    Items taking more than half the budget go on their own.
+
+    Returns:
+        list: Lists of item indexes
+    """
+    jobs = []
+    current = []
+    current_tokens = 0
+
+    for i, tokens in enumerate(token_counts):
+        if tokens > budget // 2:
+            jobs.append([i])
+            continue
+
+        if current and current_tokens + tokens > budget:
+            jobs.append(current)
+            current = []
+            current_tokens = 0
+
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        jobs.append(current)
+
+    return jobs
@@ -0,0 +1,198 @@
+"""
+Cross-source deduplication for the trusted sources researcher
+
+The same paper often comes back from arXiv and Semantic Scholar, and
+Reddit posts link to it too. Results are collapsed when they share a
+normalized URL, a DOI or arXiv id (from their own URL or explicit fields,
+never from content that merely cites one), or when their content is a near
+duplicate (MinHash estimate of the Jaccard similarity of word shingles).
+"""
+
+import hashlib
+import random
+import re
+import urllib.parse
+
+ARXIV_ID = re.compile(
+    r'(?:arxiv\.org/(?:abs|pdf)/|arxiv:\s*)([a-z\-]+(?:\.[a-z]{2})?/\d{7}|\d{4}\.\d{4,5})(?:v\d+)?',
+    re.IGNORECASE
+)
+DOI = re.compile(r'\b(10\.\d{4,9}/[^\s"<>]+)', re.IGNORECASE)
+
+# Query parameters that never change what a URL points at, by exact
+# name or by prefix
+TRACKING_PARAMS = {'ref', 'fbclid', 'gclid'}
+TRACKING_PREFIXES = ('utm_',)
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+SHINGLE_SIZE = 5
+
+# Universal hash coefficients for the MinHash permutations, fixed so
+# signatures are comparable across runs
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+
+def normalize_url(url):
+    """Canonical form of a URL: https, no www., fragment, tracking parameters or trailing slash"""
+    if not url:
+        return ''
+
+    parts = urllib.parse.urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    params = [
+        (name, value) for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query = urllib.parse.urlencode(sorted(params))
+    path = parts.path.rstrip('/')
+
+    return urllib.parse.urlunsplit(('https', host, path, query, ''))
+
+
+def extract_arxiv_id(text):
+    """arXiv id (without version) mentioned in text, or None"""
+    match = ARXIV_ID.search(text or '')
+    return match.group(1).lower() if match else None
+
+
+def extract_doi(text):
+    """DOI mentioned in text, lowercased, or None"""
+    match = DOI.search(text or '')
+    return match.group(1).rstrip('.,;)').lower() if match else None
+
+
+def identifiers(result):
+    """Every id that marks result as the same work as another result"""
+    ids = set()
+
+    for field in ('url', 'link'):
+        url = result.get(field)
+        if url:
+            ids.add(f"url:{normalize_url(url)}")
+
+    # Only the result's own links: content that cites a paper isn't that paper
+    text = " ".join(str(result.get(field) or '') for field in ('url', 'link'))
+
+    arxiv_id = result.get('arxiv_id') or extract_arxiv_id(text)
+    if arxiv_id:
+        ids.add(f"arxiv:{str(arxiv_id).lower()}")
+
+    doi = result.get('doi') or extract_doi(text)
+    if doi:
+        ids.add(f"doi:{str(doi).lower()}")
+
+    return ids
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Set of overlapping word windows of text"""
+    words = re.findall(r'\w+', (text or '').lower())
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text):
+    """MinHash signature of text's shingles, or None if text is too short"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for shingle in shingles(text)
+    ]
+    if not hashes:
+        return None
+
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def estimated_similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+def deduplicate(results, threshold=0.8):
+    """
+    Collapse duplicate results into one record each
+
+    The first result of a group (in input order) is kept, with the longest
+    content of the group, and lists every platform that returned it in
+    'found_in' and every URL in 'duplicate_urls'.
+
+    Args:
+        results (list): Fetched results
+        threshold (float): Estimated Jaccard similarity above which contents
+            count as near duplicates
+
+    Returns:
+        tuple: (unique results, stats dict)
+    """
+    parent = list(range(len(results)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        i, j = find(i), find(j)
+        if i != j:
+            # The earlier result stays the representative
+            parent[max(i, j)] = min(i, j)
+
+    # Exact matches on URL, DOI or arXiv id
+    exact = 0
+    seen_ids = {}
+    for i, result in enumerate(results):
+        for identifier in identifiers(result):
+            if identifier in seen_ids:
+                if find(seen_ids[identifier]) != find(i):
+                    exact += 1
+                union(seen_ids[identifier], i)
+            else:
+                seen_ids[identifier] = i
+
+    # Near duplicates: LSH banding proposes candidate pairs, the full
+    # signature confirms them
+    near = 0
+    signatures = [minhash(result.get('content', '')) for result in results]
+    rows = NUM_PERMUTATIONS // BANDS
+    buckets = {}
+    for i, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        for band in range(BANDS):
+            key = (band, signature[band * rows:(band + 1) * rows])
+            for j in buckets.get(key, []):
+                if find(i) != find(j) and estimated_similarity(signature, signatures[j]) >= threshold:
+                    union(i, j)
+                    near += 1
+            buckets.setdefault(key, []).append(i)
+
+    groups = {}
+    for i in range(len(results)):
+        groups.setdefault(find(i), []).append(i)
+
+    unique = []
+    for root in sorted(groups):
+        members = [results[i] for i in groups[root]]
+        record = dict(members[0])
+
+        if len(members) > 1:
+            record['content'] = max((m.get('content') or '' for m in members), key=len)
+            record['found_in'] = list(dict.fromkeys(m.get('source', 'Unknown') for m in members))
+            record['duplicate_urls'] = [m.get('url', '') for m in members[1:]]
+
+        unique.append(record)
+
+    stats = {
+        'input': len(results),
+        'unique': len(unique),
+        'collapsed': len(results) - len(unique),
+        'exact_matches': exact,
+        'near_duplicates': near
+    }
+    return unique, stats
@@ -0,0 +1,229 @@
+"""
+Local embedding index over previously fetched sources
+
+Every analyzed source saved in trusted_data_*.json files can be added to a
+persistent vector index, so later queries find similar prior results in
+milliseconds without touching the network. Texts are embedded with a
+hashing vectorizer (no model download); vectors live in a float32 file that
+is memory-mapped for queries, with one JSON metadata line per vector.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from dedup import normalize_url
+from relevance import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Metadata kept for each indexed source
+META_FIELDS = ('title', 'url', 'source', 'type', 'content', 'analysis', 'model', 'found_in')
+
+
+class HashingEmbedder:
+    """Signed feature hashing of word unigrams and bigrams, L2-normalized"""
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+
+    def _bucket(self, feature):
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+        value = int.from_bytes(digest, 'big')
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, text):
+        """Vector of text as a float32 array"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = tokenize(text)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts):
+        """Vectors of texts as a (len(texts), dim) float32 array"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self.embed(text) for text in texts])
+
+
+class EmbeddingIndex:
+    def __init__(self, directory, dim=1024):
+        """
+        Args:
+            directory (str): Holds vectors.f32, meta.jsonl and files.json
+            dim (int): Embedding size; must match an existing index
+        """
+        self.directory = directory
+        self.embedder = HashingEmbedder(dim)
+        self.dim = dim
+
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "meta.jsonl")
+        self.files_path = os.path.join(directory, "files.json")
+
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        # Metadata lines with the byte offset where each one ends; a last
+        # line cut short by a crash is left out
+        self._meta = []
+        ends = []
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    offset += len(line)
+                    if line.strip():
+                        self._meta.append(json.loads(line))
+                        ends.append(offset)
+
+        # A crash between the two appends leaves one file longer; both are
+        # cut back to the rows present in both, so later appends stay paired
+        row_bytes = 4 * self.dim
+        vector_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        rows = min(len(self._meta), vector_rows)
+        self._meta = self._meta[:rows]
+
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) != rows * row_bytes:
+            logger.warning("⚠️ Truncating %s to %s rows after an interrupted write", self.vectors_path, rows)
+            os.truncate(self.vectors_path, rows * row_bytes)
+        meta_end = ends[rows - 1] if rows else 0
+        if os.path.exists(self.meta_path) and os.path.getsize(self.meta_path) != meta_end:
+            logger.warning("⚠️ Truncating %s to %s rows after an interrupted write", self.meta_path, rows)
+            os.truncate(self.meta_path, meta_end)
+
+        self._map_vectors(rows)
+
+        self._urls = {normalize_url(meta.get('url')) for meta in self._meta}
+
+        self._files = set()
+        if os.path.exists(self.files_path):
+            with open(self.files_path, 'r', encoding='utf-8') as f:
+                self._files = set(json.load(f))
+
+    def _map_vectors(self, rows):
+        self._vectors = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+            if rows else np.zeros((0, self.dim), dtype=np.float32)
+        )
+
+    def __len__(self):
+        return len(self._meta)
+
+    def contains(self, url):
+        """True if a source with this URL (normalized) is already indexed"""
+        return normalize_url(url) in self._urls
+
+    def add(self, records, query=None, data_file=None):
+        """
+        Index analyzed records, skipping URLs already in the index
+
+        Returns:
+            int: Number of records added
+        """
+        with self._lock:
+            new = []
+            for record in records:
+                url = normalize_url(record.get('url'))
+                if url and url not in self._urls:
+                    self._urls.add(url)
+                    new.append(record)
+
+            if not new:
+                return 0
+
+            vectors = self.embedder.embed_many([f"{r.get('title', '')}\n{r.get('content', '')}" for r in new])
+            with open(self.vectors_path, 'ab') as f:
+                vectors.astype(np.float32).tofile(f)
+
+            with open(self.meta_path, 'a', encoding='utf-8') as f:
+                for record in new:
+                    meta = {field: record.get(field) for field in META_FIELDS}
+                    meta['query'] = query
+                    meta['data_file'] = data_file
+                    f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+                    self._meta.append(meta)
+
+            self._map_vectors(len(self._meta))
+            return len(new)
+
+    def build_from_data_files(self, output_dir="."):
+        """
+        Index the sources of every trusted_data_*.json in output_dir not indexed yet
+
+        Returns:
+            int: Number of sources added
+        """
+        added = 0
+        for path in sorted(glob.glob(os.path.join(output_dir, "trusted_data_*.json"))):
+            name = os.path.basename(path)
+            if name in self._files:
+                continue
+
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("⚠️ Skipping unreadable data file %s: %s", path, e)
+                continue
+
+            added += self.add(data.get('sources', []), data.get('query'), name)
+            self.mark_indexed(name)
+
+        return added
+
+    def mark_indexed(self, data_file):
+        """Remember that a data file's sources are in the index"""
+        with self._lock:
+            self._files.add(os.path.basename(data_file))
+            with open(self.files_path, 'w', encoding='utf-8') as f:
+                json.dump(sorted(self._files), f)
+
+    def query(self, text, top_k=5, min_score=0.2):
+        """
+        Indexed sources most similar to text
+
+        Args:
+            text (str): Query or document text
+            top_k (int): Max number of matches
+            min_score (float): Lowest cosine similarity returned
+
+        Returns:
+            list: Metadata dicts with a 'similarity' field, most similar first
+        """
+        with self._lock:
+            vectors, meta = self._vectors, list(self._meta)
+
+        if not meta:
+            return []
+
+        scores = vectors @ self.embedder.embed(text)
+        top_k = min(top_k, len(meta))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+
+        return [
+            dict(meta[i], similarity=round(float(scores[i]), 4))
+            for i in best if scores[i] >= min_score
+        ]
+
+    def stats(self):
+        """Size of the index"""
+        return {
+            'sources': len(self._meta),
+            'data_files': len(self._files),
+            'bytes': os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        }
@@ -0,0 +1,285 @@
+"""
+Run instrumentation for the trusted sources researcher
+
+A Tracer records spans (name, start, duration and attributes such as
+bytes and token counts) for the stages of a research run. Spans nest
+through a context variable, so a span opened inside another one becomes
+its child, including across await points. Finished runs export as Chrome
+trace JSON (chrome://tracing, Perfetto) or OpenTelemetry OTLP/JSON.
+Stages named in profile_stages are also run under cProfile, and with
+memory=True tracemalloc records the peak allocation of spans on the main
+thread (tracemalloc's peak is process-wide, so spans on worker threads
+would reset each other's; their allocations count in the peak of the
+main-thread span they run under).
+"""
+
+import contextvars
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('span_id', 'parent_id', 'name', 'start_ns', 'end_ns', 'thread_id', 'attributes')
+
+    def __init__(self, span_id, parent_id, name, start_ns, attributes):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns
+        self.end_ns = None
+        self.thread_id = threading.get_ident()
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        """Add attributes (bytes, tokens, status, ...) to the span"""
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self):
+        """Seconds the span lasted, None while it is open"""
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns is not None else None
+
+
+class _NoSpan:
+    """Stand-in yielded while the tracer is disabled"""
+
+    def set(self, **attributes):
+        pass
+
+
+class Tracer:
+    def __init__(self, enabled=True, profile_stages=(), memory=False, max_spans=None):
+        """
+        Args:
+            enabled (bool): Record spans; a disabled tracer costs almost nothing
+            profile_stages (tuple): Span names to run under cProfile (e.g. 'analyze', 'search:arxiv')
+            memory (bool): Record the peak traced allocation of main-thread spans with tracemalloc
+            max_spans (int): Keep only the latest max_spans spans for spans() and
+                the exports, so long-running processes don't grow; summary()
+                still covers every span
+        """
+        self.enabled = enabled
+        self.profile_stages = set(profile_stages)
+        self.memory = memory
+        self.max_spans = max_spans
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._spans = deque(maxlen=max_spans)
+        self._totals = {}
+        self._profiles = {}
+
+        # Wall clock of the monotonic zero, for exports that need epoch times
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Record the enclosed block as a span
+
+        Usage:
+            with tracer.span('http', host=host) as span:
+                ...
+                span.set(bytes=len(body))
+        """
+        if not self.enabled:
+            yield _NoSpan()
+            return
+
+        parent = _current_span.get()
+        span = Span(next(self._ids), parent.span_id if parent else None, name, time.perf_counter_ns(), attributes)
+        token = _current_span.set(span)
+
+        profiler = None
+        if name in self.profile_stages:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this thread
+                profiler = None
+
+        # The peak is process-wide: only main-thread spans reset and read it
+        track_memory = self.memory and threading.current_thread() is threading.main_thread()
+        if track_memory:
+            tracemalloc.reset_peak()
+
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if track_memory:
+                # Children reset the peak, so it also counts theirs
+                peak = max(tracemalloc.get_traced_memory()[1], span.attributes.get('memory_peak_bytes', 0))
+                span.set(memory_peak_bytes=peak)
+                if parent is not None:
+                    parent.set(memory_peak_bytes=max(peak, parent.attributes.get('memory_peak_bytes', 0)))
+
+            span.end_ns = time.perf_counter_ns()
+            _current_span.reset(token)
+
+            with self._lock:
+                self._add(span)
+                if profiler is not None:
+                    # Merged as they come, so long runs keep one Stats per stage
+                    if name in self._profiles:
+                        self._profiles[name].add(profiler)
+                    else:
+                        self._profiles[name] = pstats.Stats(profiler)
+
+    def bind(self, function):
+        """
+        Wrap function so spans it opens are children of the current span
+
+        Threads don't inherit context variables; pass bound functions to
+        executors instead.
+        """
+        parent = _current_span.get()
+
+        def run(*args, **kwargs):
+            token = _current_span.set(parent)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _current_span.reset(token)
+        return run
+
+    def record(self, name, start_ns, end_ns, **attributes):
+        """Add an already measured span (perf_counter_ns times) under the current span"""
+        if not self.enabled:
+            return
+
+        parent = _current_span.get()
+        span = Span(next(self._ids), parent.span_id if parent else None, name, start_ns, attributes)
+        span.end_ns = end_ns
+
+        with self._lock:
+            self._add(span)
+
+    def _add(self, span):
+        """Store a finished span and count it in the running totals (lock held)"""
+        self._spans.append(span)
+
+        totals = self._totals.setdefault(span.name, {'count': 0, 'total': 0.0, 'max': 0.0})
+        totals['count'] += 1
+        totals['total'] += span.duration
+        totals['max'] = max(totals['max'], span.duration)
+
+    def spans(self):
+        """Finished spans, in start order"""
+        with self._lock:
+            return sorted(self._spans, key=lambda span: span.start_ns)
+
+    def reset(self):
+        """Drop every recorded span and profile"""
+        with self._lock:
+            self._spans = deque(maxlen=self.max_spans)
+            self._totals = {}
+            self._profiles = {}
+
+    def summary(self):
+        """Count, total, average and max seconds per span name, over every span since the last reset"""
+        with self._lock:
+            summary = {name: dict(totals) for name, totals in self._totals.items()}
+
+        for stats in summary.values():
+            stats['avg'] = round(stats['total'] / stats['count'], 4)
+            stats['total'] = round(stats['total'], 4)
+            stats['max'] = round(stats['max'], 4)
+        return summary
+
+    def export_chrome_trace(self, path):
+        """Write the spans as Chrome trace events (complete 'X' events, microseconds)"""
+        pid = os.getpid()
+        events = [
+            {
+                'name': span.name,
+                'cat': span.name.split(':')[0],
+                'ph': 'X',
+                'ts': span.start_ns / 1000,
+                'dur': (span.end_ns - span.start_ns) / 1000,
+                'pid': pid,
+                'tid': span.thread_id,
+                'args': dict(span.attributes, span_id=span.span_id, parent_id=span.parent_id)
+            }
+            for span in self.spans()
+        ]
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def export_otel(self, path, service_name="trusted-sources-researcher"):
+        """Write the spans as one OpenTelemetry OTLP/JSON trace"""
+        trace_id = os.urandom(16).hex()
+
+        def span_id(value):
+            return f"{value:016x}" if value else ""
+
+        def attribute(key, value):
+            if isinstance(value, bool):
+                typed = {'boolValue': value}
+            elif isinstance(value, int):
+                typed = {'intValue': str(value)}
+            elif isinstance(value, float):
+                typed = {'doubleValue': value}
+            else:
+                typed = {'stringValue': str(value)}
+            return {'key': key, 'value': typed}
+
+        spans = [
+            {
+                'traceId': trace_id,
+                'spanId': span_id(span.span_id),
+                'parentSpanId': span_id(span.parent_id),
+                'name': span.name,
+                'kind': 1,
+                'startTimeUnixNano': str(span.start_ns + self._epoch_offset_ns),
+                'endTimeUnixNano': str(span.end_ns + self._epoch_offset_ns),
+                'attributes': [attribute(key, value) for key, value in span.attributes.items() if value is not None]
+            }
+            for span in self.spans()
+        ]
+
+        document = {
+            'resourceSpans': [{
+                'resource': {'attributes': [attribute('service.name', service_name)]},
+                'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}]
+            }]
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f)
+        return path
+
+    def write_profiles(self, directory):
+        """
+        Write one merged cProfile stats file per profiled stage
+
+        Returns:
+            list: Paths of the .prof files (open with pstats or snakeviz)
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        with self._lock:
+            for name, stats in self._profiles.items():
+                path = os.path.join(directory, f"{name.replace(':', '_')}.prof")
+                stats.dump_stats(path)
+                paths.append(path)
+        return paths
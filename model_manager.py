@@ -0,0 +1,175 @@
+"""
+Model selection for the trusted sources researcher
+
+ModelManager decides which Ollama model a prompt goes to. It starts with
+the model the researcher was created with, falls back through the other
+configured models, keeps the chosen model loaded with keep_alive and
+remembers failures with a per-model circuit breaker so later calls go
+straight to a model that works.
+"""
+
+import logging
+import threading
+import time
+
+import ollama
+
+logger = logging.getLogger(__name__)
+
+# Models tried after the preferred one, in order
+FALLBACK_MODELS = ["tinyllama", "phi", "mistral:7b-instruct-q4_0"]
+
+
+class ModelManager:
+    def __init__(self, client, preferred, fallbacks=None, keep_alive="10m",
+                 failure_threshold=2, cooldown=300, probe_ttl=60):
+        """
+        Args:
+            client (ollama.Client): Client used for probing and warming
+            preferred (str): Model to use whenever it is healthy
+            fallbacks (list): Models tried after the preferred one
+            keep_alive (str): How long Ollama keeps a used model loaded
+            failure_threshold (int): Consecutive failures that open a model's circuit
+            cooldown (int): Seconds an open circuit skips the model before it is retried
+            probe_ttl (int): Seconds a probe of installed/loaded models is trusted
+        """
+        self.client = client
+        self.preferred = preferred
+        self.fallbacks = list(fallbacks if fallbacks is not None else FALLBACK_MODELS)
+        self.keep_alive = keep_alive
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_ttl = probe_ttl
+
+        self._lock = threading.Lock()
+        self._health = {}
+        self._installed = None
+        self._loaded = set()
+        self._probed_at = None
+
+    def preference_order(self):
+        """Every configured model, preferred first, without duplicates"""
+        order = []
+        for model in [self.preferred] + self.fallbacks:
+            if model and model not in order:
+                order.append(model)
+        return order
+
+    def probe(self, force=False):
+        """
+        Ask Ollama which models are installed and which are loaded
+
+        Results are reused for probe_ttl seconds. If Ollama can't be reached
+        nothing is assumed about installed models.
+        """
+        with self._lock:
+            if not force and self._probed_at and time.monotonic() - self._probed_at < self.probe_ttl:
+                return
+
+        try:
+            installed = {self._model_name(m) for m in self.client.list().get('models', [])}
+            loaded = {self._model_name(m) for m in self.client.ps().get('models', [])}
+        except Exception as e:
+            logger.warning("⚠️ Could not probe Ollama models: %s", e)
+            installed, loaded = None, set()
+
+        with self._lock:
+            self._installed = installed
+            self._loaded = loaded
+            self._probed_at = time.monotonic()
+
+    def _model_name(self, entry):
+        return entry.get('model') or entry.get('name') or ''
+
+    def _is_installed(self, model):
+        """True unless a probe showed the model is missing (lock held)"""
+        if self._installed is None:
+            return True
+        # Ollama reports untagged models as name:latest
+        return model in self._installed or f"{model}:latest" in self._installed
+
+    def _is_loaded(self, model):
+        return model in self._loaded or f"{model}:latest" in self._loaded
+
+    def candidates(self):
+        """
+        Models to try for the next prompt, best first
+
+        The preferred model stays first while it is healthy. Remaining
+        fallbacks that are already loaded come before ones that would need
+        to be loaded. Models with an open circuit or that aren't installed
+        are skipped.
+        """
+        self.probe()
+        now = time.monotonic()
+
+        with self._lock:
+            healthy = []
+            for model in self.preference_order():
+                health = self._health.get(model)
+                if health and health['open_until'] > now:
+                    continue
+                if not self._is_installed(model):
+                    continue
+                healthy.append(model)
+
+            if not healthy:
+                return []
+
+            first = healthy[:1] if healthy[0] == self.preferred else []
+            rest = [m for m in healthy if m not in first]
+            rest.sort(key=lambda m: not self._is_loaded(m))
+            return first + rest
+
+    def record_success(self, model):
+        """Close the model's circuit after a successful call"""
+        with self._lock:
+            self._health[model] = {'failures': 0, 'open_until': 0, 'last_error': None}
+            self._loaded.add(model)
+
+    def record_failure(self, model, error):
+        """Count a failed call, opening the circuit once failures reach the threshold"""
+        with self._lock:
+            health = self._health.setdefault(model, {'failures': 0, 'open_until': 0, 'last_error': None})
+            health['failures'] += 1
+            health['last_error'] = str(error)
+            self._loaded.discard(model)
+
+            # A missing model or one that doesn't fit in memory won't recover
+            # on the next call, so skip it right away
+            permanent = (isinstance(error, ollama.ResponseError) and error.status_code == 404) or \
+                "memory" in str(error).lower()
+
+            if permanent or health['failures'] >= self.failure_threshold:
+                health['open_until'] = time.monotonic() + self.cooldown
+                logger.warning("⚠️ Skipping model %s for %ss: %s", model, self.cooldown, error)
+
+    def warm(self, model=None):
+        """Load a model (the preferred one by default) and keep it loaded for keep_alive"""
+        model = model or self.preferred
+        try:
+            # An empty prompt only loads the model
+            self.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+            self.record_success(model)
+            return True
+        except Exception as e:
+            self.record_failure(model, e)
+            return False
+
+    def status(self):
+        """Health of every configured model"""
+        self.probe()
+        now = time.monotonic()
+
+        with self._lock:
+            status = {}
+            for model in self.preference_order():
+                health = self._health.get(model, {'failures': 0, 'open_until': 0, 'last_error': None})
+                status[model] = {
+                    'installed': self._is_installed(model),
+                    'loaded': self._is_loaded(model),
+                    'failures': health['failures'],
+                    'circuit_open': health['open_until'] > now,
+                    'last_error': health['last_error']
+                }
+            return status
@@ -0,0 +1,264 @@
+"""
+Per-host rate limiting for the trusted sources researcher
+
+RateLimitScheduler keeps a token bucket for every rate key (usually a
+provider host). Callers block in acquire() until a token is available;
+waiting callers are served by priority, then in arrival order. Responses
+are fed back through update() so Retry-After and X-RateLimit-* headers,
+and 429/503 answers, pause or slow down the key adaptively.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Statuses meaning "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+
+class RateLimitScheduler:
+    def __init__(self, base_backoff=1.0, max_backoff=300.0, min_rate_factor=0.1):
+        """
+        Args:
+            base_backoff (float): First pause (seconds) after a throttled response without Retry-After
+            max_backoff (float): Longest pause applied by adaptive backoff
+            min_rate_factor (float): Lowest fraction of its configured rate a key is slowed to
+        """
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.min_rate_factor = min_rate_factor
+
+        self._cond = threading.Condition()
+        self._keys = {}
+        self._sequence = itertools.count()
+
+    def _state(self, key):
+        """Bucket state for key, created unlimited on first use (lock held)"""
+        state = self._keys.get(key)
+        if state is None:
+            state = {
+                'rate': None,           # configured tokens per second, None = unlimited
+                'burst': 1,
+                'factor': 1.0,          # adaptive slowdown applied to rate
+                'tokens': 1.0,
+                'updated': time.monotonic(),
+                'blocked_until': 0.0,
+                'backoff': 0.0,
+                'waiters': [],
+                'requests': 0,
+                'waits': 0,
+                'wait_seconds': 0.0,
+                'throttled': 0
+            }
+            self._keys[key] = state
+        return state
+
+    def configure(self, key, rate, burst=1):
+        """
+        Set the sustained rate (requests/second) and burst size for key
+
+        A burst larger than one lets that many requests go out back to back
+        before the rate applies.
+        """
+        with self._cond:
+            state = self._state(key)
+            state['rate'] = rate
+            state['burst'] = max(1, burst)
+            state['tokens'] = float(state['burst'])
+            state['updated'] = time.monotonic()
+            self._cond.notify_all()
+
+    def _refill(self, state, now):
+        if state['rate']:
+            elapsed = now - state['updated']
+            rate = state['rate'] * state['factor']
+            state['tokens'] = min(float(state['burst']), state['tokens'] + elapsed * rate)
+        state['updated'] = now
+
+    def _delay(self, state, now):
+        """Seconds until the head waiter of state may go (lock held)"""
+        if state['blocked_until'] > now:
+            return state['blocked_until'] - now
+
+        if not state['rate']:
+            return 0.0
+
+        self._refill(state, now)
+        if state['tokens'] >= 1:
+            return 0.0
+        return (1 - state['tokens']) / (state['rate'] * state['factor'])
+
+    def acquire(self, key, priority=0):
+        """
+        Block until a request to key may be sent
+
+        Args:
+            key (str): Rate key, usually the provider host
+            priority (int): Lower values are served first among waiting callers
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        started = time.monotonic()
+
+        with self._cond:
+            state = self._state(key)
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(state['waiters'], ticket)
+
+            try:
+                while True:
+                    if state['waiters'][0] == ticket:
+                        delay = self._delay(state, time.monotonic())
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                state['waiters'].remove(ticket)
+                heapq.heapify(state['waiters'])
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(state['waiters'])
+            if state['rate']:
+                state['tokens'] -= 1
+
+            waited = time.monotonic() - started
+            state['requests'] += 1
+            if waited > 0.001:
+                state['waits'] += 1
+                state['wait_seconds'] += waited
+
+            # The next waiter becomes head
+            self._cond.notify_all()
+
+        return waited
+
+    def try_acquire(self, key, priority=0, waited=0.0):
+        """
+        Take a token for key without blocking, for callers that can't block (asyncio)
+
+        A token is only taken when no blocked caller with the same or a
+        lower priority value is waiting for key.
+
+        Args:
+            key (str): Rate key
+            priority (int): Lower values go first
+            waited (float): Seconds the caller has waited so far, for the stats
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds to wait before trying again
+        """
+        with self._cond:
+            state = self._state(key)
+            now = time.monotonic()
+
+            if state['waiters'] and state['waiters'][0][0] <= priority:
+                # Check again shortly; the blocked caller goes first
+                return max(0.01, self._delay(state, now))
+
+            delay = self._delay(state, now)
+            if delay > 0:
+                return delay
+
+            if state['rate']:
+                state['tokens'] -= 1
+            state['requests'] += 1
+            if waited > 0.001:
+                state['waits'] += 1
+                state['wait_seconds'] += waited
+            return 0.0
+
+    def update(self, key, response):
+        """
+        Adjust key from a response's status and rate limit headers
+
+        Retry-After and an exhausted X-RateLimit-Remaining pause the key until
+        the given time. 429/503 without Retry-After pause it with an
+        exponential backoff and halve its rate; successful responses restore
+        the rate gradually.
+        """
+        now = time.monotonic()
+        headers = response.headers
+        retry_after = self._parse_retry_after(headers.get('Retry-After'))
+
+        with self._cond:
+            state = self._state(key)
+            pause = 0.0
+
+            if retry_after is not None:
+                pause = retry_after
+
+            remaining = headers.get('X-RateLimit-Remaining')
+            reset = self._parse_reset(headers.get('X-RateLimit-Reset'))
+            if remaining is not None and reset is not None:
+                try:
+                    if float(remaining) < 1:
+                        pause = max(pause, reset)
+                except ValueError:
+                    pass
+
+            if response.status_code in THROTTLE_STATUSES:
+                state['throttled'] += 1
+                state['factor'] = max(self.min_rate_factor, state['factor'] / 2)
+                if not pause:
+                    state['backoff'] = min(self.max_backoff, max(self.base_backoff, state['backoff'] * 2))
+                    pause = state['backoff']
+            elif response.status_code < 400:
+                state['backoff'] = 0.0
+                state['factor'] = min(1.0, state['factor'] * 1.25)
+
+            if pause:
+                state['blocked_until'] = max(state['blocked_until'], now + min(pause, self.max_backoff))
+
+            self._cond.notify_all()
+
+    def _parse_retry_after(self, value):
+        """Retry-After as seconds from now (delta-seconds or an HTTP date)"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _parse_reset(self, value):
+        """X-RateLimit-Reset as seconds from now; GitHub sends an epoch time, Reddit a delay"""
+        if not value:
+            return None
+        try:
+            reset = float(value)
+        except ValueError:
+            return None
+        if reset > 1e9:
+            reset -= time.time()
+        return max(0.0, reset)
+
+    def stats(self):
+        """Per-key request, wait and throttling counters"""
+        with self._cond:
+            now = time.monotonic()
+            return {
+                key: {
+                    'requests': state['requests'],
+                    'waits': state['waits'],
+                    'wait_seconds': round(state['wait_seconds'], 3),
+                    'throttled': state['throttled'],
+                    'rate_factor': round(state['factor'], 3),
+                    'blocked_for': round(max(0.0, state['blocked_until'] - now), 3)
+                }
+                for key, state in self._keys.items()
+            }
+
+    def total_wait_seconds(self):
+        """Time all callers together spent waiting on limits"""
+        with self._cond:
+            return round(sum(state['wait_seconds'] for state in self._keys.values()), 3)
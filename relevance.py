@@ -0,0 +1,94 @@
+"""
+Local relevance scoring for the trusted sources researcher
+
+Fetched results are scored against the query with BM25 before any of them
+reach the LLM, so only the most relevant candidates are analyzed. Scores
+are computed with NumPy over a documents x query-terms frequency matrix.
+"""
+
+import re
+
+import numpy as np
+
+# Words too common to say anything about relevance
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in is it its of on or that the
+this to was were what when where which who why will with
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens of text, without stopwords"""
+    return [word for word in re.findall(r'\w+', (text or '').lower()) if word not in STOPWORDS]
+
+
+def bm25_scores(query, documents, k1=1.5, b=0.75):
+    """
+    BM25 score of every document for query, scaled to 0..1
+
+    Scores are divided by the score a document would reach with unlimited
+    occurrences of every query term, so they are comparable across queries.
+
+    Args:
+        query (str): Research query
+        documents (list): Document texts
+        k1 (float): Term frequency saturation
+        b (float): Document length normalization
+
+    Returns:
+        numpy.ndarray: One score per document
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not documents or not terms:
+        return np.zeros(len(documents))
+
+    column = {term: j for j, term in enumerate(terms)}
+    tf = np.zeros((len(documents), len(terms)))
+    lengths = np.zeros(len(documents))
+
+    for i, document in enumerate(documents):
+        tokens = tokenize(document)
+        lengths[i] = len(tokens)
+        for token in tokens:
+            j = column.get(token)
+            if j is not None:
+                tf[i, j] += 1
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5))
+
+    average_length = lengths.mean() or 1.0
+    norm = k1 * (1 - b + b * lengths / average_length)
+    scores = (idf * tf * (k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+    return scores / (idf * (k1 + 1)).sum()
+
+
+def rank_results(query, results, top_k=None, min_score=0.0):
+    """
+    Order results by relevance to query and prune the tail
+
+    Each kept result gets a 'relevance' field. Titles are scored together
+    with the content.
+
+    Args:
+        query (str): Research query
+        results (list): Result dicts with title and content
+        top_k (int): Keep at most this many results (None keeps all)
+        min_score (float): Drop results scoring below this (0..1)
+
+    Returns:
+        tuple: (kept results, most relevant first; number pruned)
+    """
+    scores = bm25_scores(query, [f"{r.get('title', '')}\n{r.get('content', '')}" for r in results])
+
+    # Stable, so equally relevant results keep their plan order
+    order = np.argsort(-scores, kind='stable')
+
+    ranked = []
+    for i in order:
+        if scores[i] < min_score or (top_k is not None and len(ranked) >= top_k):
+            continue
+        ranked.append(dict(results[i], relevance=round(float(scores[i]), 4)))
+
+    return ranked, len(results) - len(ranked)
@@ -0,0 +1,185 @@
+"""
+Streaming report writer for the trusted sources researcher
+
+The report is produced section by section so it can be written to a file
+while the analyses are still running, instead of being built as one string.
+"""
+
+import textwrap
+from datetime import datetime
+
+
+def format_header(query, results):
+    """Title block, executive summary and source breakdown"""
+    header = f"""
+{'='*80}
+TRUSTED SOURCES RESEARCH REPORT
+{'='*80}
+
+Query: {query}
+Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+Sources: {len(results)} trusted sources
+
+{'='*80}
+
+EXECUTIVE SUMMARY
+-----------------
+This report analyzes {len(results)} sources from trusted platforms including
+academic databases, Wikipedia, and verified repositories to provide reliable
+information about {query}.
+
+SOURCE BREAKDOWN
+----------------
+"""
+
+    # Count sources by type
+    source_counts = {}
+    for result in results:
+        source = result.get('source', 'Unknown')
+        source_counts[source] = source_counts.get(source, 0) + 1
+
+    for source, count in source_counts.items():
+        header += f"• {source}: {count} sources\n"
+
+    header += "\n"
+    header += """
+KEY FINDINGS
+------------
+"""
+    return header
+
+
+def format_finding(i, result):
+    """One numbered entry of the key findings section"""
+    title = result.get('title', f'Source {i}')
+    source = result.get('source', 'Unknown')
+    analysis = result.get('analysis', 'No analysis available')
+
+    # Wrap text properly
+    wrapped_analysis = textwrap.fill(analysis, width=75, initial_indent='', subsequent_indent='   ')
+
+    return f"""
+{i}. [{source}] {title}
+   {wrapped_analysis}
+
+"""
+
+
+def format_sources_heading():
+    """Heading of the detailed sources section"""
+    return """
+DETAILED SOURCES
+----------------
+"""
+
+
+def format_source_details(i, result):
+    """One entry of the detailed sources section"""
+    title = result.get('title', f'Source {i}')
+    url = result.get('url', 'No URL')
+    source = result.get('source', 'Unknown')
+    content = result.get('content', 'No content')
+
+    # Works collapsed across platforms list every platform
+    found_in = result.get('found_in') or []
+    if len(found_in) > 1:
+        source = ", ".join(found_in)
+
+    # Format URL for readability
+    display_url = url[:60] + "..." if len(url) > 60 else url
+
+    wrapped_content = textwrap.fill(content, width=75, initial_indent='', subsequent_indent='   ')
+
+    relevance = result.get('relevance')
+    relevance_line = f"Relevance: {relevance:.2f}\n" if relevance is not None else ""
+
+    return f"""
+Source {i}: {title}
+Platform: {source}
+URL: {display_url}
+{relevance_line}
+Content Summary:
+{wrapped_content}
+
+"""
+
+
+def format_footer():
+    """Closing block of the report"""
+    return f"""
+{'='*80}
+Report generated using trusted, accessible sources
+Avoiding paywalls and bot-detection issues
+{'='*80}
+"""
+
+
+def iter_report(query, results):
+    """Yield the sections of a report over fully analyzed results"""
+    yield format_header(query, results)
+
+    for i, result in enumerate(results, 1):
+        yield format_finding(i, result)
+
+    yield format_sources_heading()
+
+    for i, result in enumerate(results, 1):
+        yield format_source_details(i, result)
+
+    yield format_footer()
+
+
+class ReportWriter:
+    """
+    Write a report to a file-like sink as analyses complete
+
+    The header only needs the sources that are going to be analyzed, so it
+    is written up front. Findings can arrive in any order and are emitted
+    in source order as soon as every earlier one is available.
+    """
+
+    def __init__(self, sink, query, sources):
+        """
+        Args:
+            sink: File-like object with write() (and optionally flush())
+            query (str): Research query
+            sources (list): The sources the report will cover, in report order
+        """
+        self.sink = sink
+        self.query = query
+        self.sources = sources
+        self._pending = {}
+        self._next_index = 0
+
+    def _emit(self, text):
+        self.sink.write(text)
+        if hasattr(self.sink, 'flush'):
+            self.sink.flush()
+
+    def write_header(self):
+        """Write the title block and source breakdown"""
+        self._emit(format_header(self.query, self.sources))
+
+    def add_finding(self, index, result):
+        """Queue the analyzed result for sources[index], writing every finding that is now in order"""
+        self._pending[index] = result
+        self._write_ready_findings()
+
+    def _write_ready_findings(self):
+        while self._next_index in self._pending:
+            result = self._pending.pop(self._next_index)
+            self._next_index += 1
+            self._emit(format_finding(self._next_index, result))
+
+    def finish(self, results):
+        """Write any remaining findings, the detailed sources and the footer"""
+        for index, result in enumerate(results):
+            if index >= self._next_index:
+                self._pending.setdefault(index, result)
+        self._write_ready_findings()
+
+        self._emit(format_sources_heading())
+        for i, result in enumerate(results, 1):
+            self._emit(format_source_details(i, result))
+
+        self._emit(format_footer())
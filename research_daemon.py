@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Long-running research daemon with a local HTTP/JSON API
+
+One process keeps a TrustedSourcesResearcher warm (pooled sessions,
+response and analysis caches, rate limits, loaded models) and serves
+research requests from a fixed pool of workers. Identical queries that are
+already queued or running are coalesced, so concurrent callers share one
+fetch and analysis. The job queue is bounded: when it is full, new
+requests get 503 with a Retry-After estimate instead of piling up.
+
+API:
+    POST /research   {"query": ..., "categories": [...], "max_sources_per_category": 2,
+                      "batch": false, "use_index": false, "wait": true, "timeout": 300}
+    GET  /jobs/<id>  Status (and report once done) of a job
+    GET  /health     Queue depth, workers and model health
+    GET  /stats      Cache, rate limit, LLM and coalescing counters
+
+Usage:
+    python research_daemon.py --port 8400 --workers 2 --queue-size 16
+    curl -X POST localhost:8400/research -d '{"query": "protein folding"}'
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from analysis_cache import normalize_query
+from batch_runner import DEFAULT_CATEGORIES
+from trusted_sources_researcher import TrustedSourcesResearcher
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for GET /jobs/<id>
+FINISHED_JOBS_KEPT = 200
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 64 * 1024
+
+# Spans kept with --trace; /stats timings still cover every span
+TRACE_SPANS_KEPT = 10000
+
+
+class QueueFull(Exception):
+    """Raised by ResearchDaemon.submit when the job queue is full"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, key, spec):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.spec = spec
+        self.status = 'queued'
+        self.report = None
+        self.error = None
+        self.callers = 1
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self, include_report=True):
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'query': self.spec['query'],
+            'categories': self.spec['categories'],
+            'max_sources_per_category': self.spec['max_sources_per_category'],
+            'callers': self.callers,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'error': self.error
+        }
+        if include_report:
+            data['report'] = self.report
+        return data
+
+
+class ResearchDaemon:
+    def __init__(self, researcher, workers=2, queue_size=16):
+        """
+        Args:
+            researcher (TrustedSourcesResearcher): Shared by every job
+            workers (int): Research requests run at once
+            queue_size (int): Jobs waiting for a worker before new ones are refused
+        """
+        self.researcher = researcher
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._jobs = OrderedDict()
+        self._threads = []
+        self._running = 0
+
+        self.counters = {'submitted': 0, 'coalesced': 0, 'rejected': 0, 'completed': 0, 'failed': 0,
+                         'job_seconds': 0.0}
+
+    def start(self):
+        """Start the workers and load the preferred model in the background"""
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"research-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        threading.Thread(target=self.researcher.models.warm, daemon=True).start()
+
+    def stop(self, timeout=None):
+        """Let running jobs finish and stop the workers; queued jobs are failed"""
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(job, error="daemon shutting down")
+
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _key(self, spec):
+        """Requests with the same key share one job"""
+        return (normalize_query(spec['query']), tuple(sorted(spec['categories'])),
+                spec['max_sources_per_category'], spec['batch'], spec['use_index'])
+
+    def submit(self, spec):
+        """
+        Queue a research job, or join the identical one already queued or running
+
+        Returns:
+            tuple: (job, coalesced)
+
+        Raises:
+            QueueFull: The queue has no room; retry_after estimates when it will
+        """
+        key = self._key(spec)
+
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None:
+                job.callers += 1
+                self.counters['coalesced'] += 1
+                return job, True
+
+            job = Job(key, spec)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.counters['rejected'] += 1
+                raise QueueFull(self.retry_after())
+
+            self._in_flight[key] = job
+            self._remember(job)
+            self.counters['submitted'] += 1
+
+        return job, False
+
+    def retry_after(self):
+        """Seconds until a queue slot is likely to free up, from the average job time"""
+        completed = self.counters['completed'] + self.counters['failed']
+        average = self.counters['job_seconds'] / completed if completed else 30.0
+        return max(1, math.ceil(average * max(1, self._queue.qsize()) / self.workers))
+
+    def _remember(self, job):
+        """Keep job for lookups, dropping the oldest finished ones (lock held)"""
+        self._jobs[job.id] = job
+        finished = [job_id for job_id, kept in self._jobs.items() if kept.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job_id]
+
+    def job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            with self._lock:
+                self._running += 1
+            job.status = 'running'
+            job.started = time.time()
+            spec = job.spec
+
+            try:
+                report = self.researcher.conduct_research(
+                    spec['query'], spec['categories'], spec['max_sources_per_category'],
+                    concurrent=True, batch=spec['batch'], use_index=spec['use_index']
+                )
+                if report is None:
+                    self._finish(job, error="no suitable sources found")
+                else:
+                    self._finish(job, report=report)
+            except Exception as e:
+                logger.exception("❌ Research job %s failed", job.id)
+                self._finish(job, error=str(e))
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def _finish(self, job, report=None, error=None):
+        job.report = report
+        job.error = error
+        job.status = 'failed' if error else 'done'
+        job.finished = time.time()
+
+        with self._lock:
+            # Requests arriving from now on start a new job
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+            self.counters['failed' if error else 'completed'] += 1
+            if job.started:
+                self.counters['job_seconds'] += job.finished - job.started
+
+        job.done.set()
+
+    def health(self):
+        with self._lock:
+            running = self._running
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'running': running,
+            'queued': self._queue.qsize(),
+            'queue_size': self.queue_size,
+            'models': self.researcher.models.status()
+        }
+
+    def stats(self):
+        researcher = self.researcher
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            'jobs': counters,
+            'response_cache': researcher.response_cache.stats() if researcher.response_cache else None,
+            'analysis_cache': researcher.analysis_cache.stats() if researcher.analysis_cache else None,
+            'rate_limits': researcher.rate_limiter.stats(),
+            'llm': dict(researcher.llm_counters),
+            'models': researcher.model_latency_stats(),
+            'stages': researcher.tracer.summary()
+        }
+
+
+def parse_spec(body):
+    """
+    Validate a POST /research body
+
+    Returns:
+        dict: query, categories, max_sources_per_category, batch, use_index, wait and timeout
+
+    Raises:
+        ValueError: The body is not a valid request
+    """
+    if not isinstance(body, dict):
+        raise ValueError("request body must be a JSON object")
+
+    query = body.get('query')
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("'query' must be a non-empty string")
+
+    categories = body.get('categories') or DEFAULT_CATEGORIES
+    if not isinstance(categories, list) or not all(isinstance(c, str) for c in categories):
+        raise ValueError("'categories' must be a list of strings")
+
+    try:
+        max_sources = int(body.get('max_sources_per_category', 2))
+        timeout = float(body.get('timeout', 300))
+    except (TypeError, ValueError):
+        raise ValueError("'max_sources_per_category' and 'timeout' must be numbers")
+    if not 1 <= max_sources <= 20:
+        raise ValueError("'max_sources_per_category' must be between 1 and 20")
+
+    return {
+        'query': query.strip(),
+        'categories': categories,
+        'max_sources_per_category': max_sources,
+        'batch': bool(body.get('batch', False)),
+        'use_index': bool(body.get('use_index', False)),
+        'wait': bool(body.get('wait', True)),
+        'timeout': max(0.0, timeout)
+    }
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=None):
+        self._send_json(status, {'error': message}, headers)
+
+    def _with_client_slot(self, handle):
+        """Run handle() if a client slot is free, otherwise answer 503"""
+        slots = self.server.client_slots
+        if not slots.acquire(blocking=False):
+            self._error(503, "too many clients", {'Retry-After': '1'})
+            return
+        try:
+            handle()
+        finally:
+            slots.release()
+
+    def do_GET(self):
+        daemon = self.server.daemon
+        path = self.path.split('?', 1)[0].rstrip('/')
+
+        if path == '/health':
+            self._send_json(200, daemon.health())
+        elif path == '/stats':
+            self._send_json(200, daemon.stats())
+        elif path.startswith('/jobs/'):
+            job = daemon.job(path[len('/jobs/'):])
+            if job is None:
+                self._error(404, "unknown job")
+            else:
+                self._send_json(200, job.to_dict())
+        else:
+            self._error(404, "not found")
+
+    def do_POST(self):
+        if self.path.split('?', 1)[0].rstrip('/') != '/research':
+            self._error(404, "not found")
+            return
+        self._with_client_slot(self._research)
+
+    def _research(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self._error(413, "request body too large")
+            self.close_connection = True
+            return
+
+        try:
+            spec = parse_spec(json.loads(self.rfile.read(length) or b'{}'))
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+
+        daemon = self.server.daemon
+        try:
+            job, coalesced = daemon.submit(spec)
+        except QueueFull as e:
+            self._error(503, str(e), {'Retry-After': str(e.retry_after)})
+            return
+
+        if spec['wait']:
+            job.done.wait(spec['timeout'])
+
+        data = job.to_dict(include_report=job.done.is_set())
+        data['coalesced'] = coalesced
+        self._send_json(200 if job.done.is_set() else 202, data, {'Location': f"/jobs/{job.id}"})
+
+
+class DaemonServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, daemon, max_clients=64):
+        """
+        Args:
+            address (tuple): (host, port) to listen on
+            daemon (ResearchDaemon): Serves the requests
+            max_clients (int): POST /research requests handled (or waited on) at once
+        """
+        super().__init__(address, DaemonRequestHandler)
+        self.daemon = daemon
+        self.client_slots = threading.BoundedSemaphore(max_clients)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve research requests over a local HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8400, help="Port to listen on (default: 8400)")
+    parser.add_argument("--workers", type=int, default=2, help="Research requests run at once (default: 2)")
+    parser.add_argument("--queue-size", type=int, default=16, help="Jobs waiting before requests get 503 (default: 16)")
+    parser.add_argument("--max-clients", type=int, default=64, help="Research requests handled at once (default: 64)")
+    parser.add_argument("--model", default="tinyllama", help="Preferred Ollama model")
+    parser.add_argument("--max-in-flight", type=int, default=2, help="Concurrent LLM requests across all jobs")
+    parser.add_argument("--cache-dir", default=".research_cache", help="Response and analysis cache directory")
+    parser.add_argument("--output-dir", default=".", help="Where reports and data files are written")
+    parser.add_argument("--store-dir", help="Append run data to this results store instead of JSON files")
+    parser.add_argument("--adaptive-target", type=int,
+                        help="Stop each fetch once this many relevant results have arrived")
+    parser.add_argument("--trace", action="store_true", help="Record stage timings (shown by GET /stats)")
+    parser.add_argument("--quiet", action="store_true", help="Only log warnings and errors")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
+
+    with TrustedSourcesResearcher(model_name=args.model, max_in_flight=args.max_in_flight,
+                                  cache_dir=args.cache_dir, output_dir=args.output_dir,
+                                  store_dir=args.store_dir, index_dir=os.path.join(args.cache_dir, "index"),
+                                  adaptive_target=args.adaptive_target, trace=args.trace,
+                                  trace_max_spans=TRACE_SPANS_KEPT) as researcher:
+        daemon = ResearchDaemon(researcher, args.workers, args.queue_size)
+        server = DaemonServer((args.host, args.port), daemon, args.max_clients)
+        daemon.start()
+
+        logger.info("🛰️ Research daemon listening on http://%s:%s", args.host, args.port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            daemon.stop()
+            logger.info("👋 Research daemon stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+On-disk HTTP response cache for the trusted sources researcher
+
+Responses are stored in SQLite with a per-host TTL and size-bounded LRU
+eviction. Stale entries that carry an ETag or Last-Modified header are
+revalidated with a conditional request instead of being fetched again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Seconds a cached response stays fresh, by provider host
+DEFAULT_TTLS = {
+    "export.arxiv.org": 6 * 3600,
+    "api.semanticscholar.org": 6 * 3600,
+    "en.wikipedia.org": 24 * 3600,
+    "api.github.com": 3600,
+    "www.reddit.com": 30 * 60,
+}
+
+# Request headers that change the response and so are part of the cache key
+KEY_HEADERS = ("accept", "range")
+
+# Response headers that no longer apply once the body is decoded and cached
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection")
+
+
+class ResponseCache:
+    def __init__(self, path, ttls=None, default_ttl=3600, max_bytes=200 * 1024 * 1024):
+        """
+        Args:
+            path (str): SQLite database file
+            ttls (dict): Freshness lifetime in seconds by host, merged over DEFAULT_TTLS
+            default_ttl (int): Lifetime for hosts without an entry in ttls
+            max_bytes (int): Total body size kept before least recently used
+                entries are evicted
+        """
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                host TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._db.commit()
+
+        self.counters = {"hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_saved": 0}
+
+    def make_key(self, url, headers=None):
+        """Cache key for a GET of url with the given request headers"""
+        headers = CaseInsensitiveDict(headers or {})
+        parts = [url] + [f"{name}={headers.get(name, '')}" for name in KEY_HEADERS]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def ttl_for(self, url):
+        """Freshness lifetime in seconds for url"""
+        host = urllib.parse.urlsplit(url).netloc
+        return self.ttls.get(host, self.default_ttl)
+
+    def get(self, url, headers=None):
+        """
+        Look up a cached response
+
+        Returns:
+            dict: The entry with a 'fresh' flag, or None when nothing is cached
+        """
+        key = self.make_key(url, headers)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, body, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        status, stored_headers, body, fetched_at = row
+        return {
+            "key": key,
+            "url": url,
+            "status": status,
+            "headers": json.loads(stored_headers),
+            "body": body,
+            "fresh": time.time() - fetched_at < self.ttl_for(url),
+        }
+
+    def conditional_headers(self, entry):
+        """Headers that let the server answer 304 Not Modified for entry"""
+        stored = CaseInsensitiveDict(entry["headers"])
+        headers = {}
+
+        if stored.get("etag"):
+            headers["If-None-Match"] = stored["etag"]
+        if stored.get("last-modified"):
+            headers["If-Modified-Since"] = stored["last-modified"]
+
+        return headers
+
+    def hit(self, entry, revalidated=False):
+        """Serve entry from the cache, refreshing its age if it was revalidated"""
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._db.execute(
+                    "UPDATE responses SET fetched_at = ?, last_access = ? WHERE key = ?",
+                    (now, now, entry["key"])
+                )
+                self.counters["revalidated"] += 1
+            else:
+                self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, entry["key"]))
+                self.counters["hits"] += 1
+
+            self._db.commit()
+            self.counters["bytes_saved"] += len(entry["body"])
+
+        return self.to_response(entry)
+
+    def put(self, url, headers, response):
+        """Record a miss and store a successful response"""
+        with self._lock:
+            self.counters["misses"] += 1
+
+        if self._cacheable(response):
+            self._store(url, headers, response, response.content)
+
+    def tee(self, url, headers, response):
+        """
+        Record a miss for a streamed response and store its body once read to the end
+
+        The response's iter_content() copies the chunks it yields; a body
+        abandoned before its end is not stored. For a request with a
+        "Range: bytes=0-N" header, the first N + 1 bytes are stored as soon
+        as they have been read, since callers stop reading there (and a
+        server ignoring the range may send more).
+        """
+        with self._lock:
+            self.counters["misses"] += 1
+
+        if not self._cacheable(response):
+            return response
+
+        iter_content = response.iter_content
+        wanted = self._range_length(headers)
+
+        def teeing_iter_content(chunk_size=1, decode_unicode=False):
+            body = bytearray()
+            stored = False
+            for chunk in iter_content(chunk_size, decode_unicode):
+                body.extend(chunk)
+                if wanted and not stored and len(body) >= wanted:
+                    self._store(url, headers, response, bytes(body[:wanted]))
+                    stored = True
+                yield chunk
+            if not stored:
+                self._store(url, headers, response, bytes(body))
+
+        response.iter_content = teeing_iter_content
+        return response
+
+    def tee_async(self, url, headers, response):
+        """tee() for an httpx response read with aiter_bytes(); the body is stored off the event loop"""
+        with self._lock:
+            self.counters["misses"] += 1
+
+        if not self._cacheable(response):
+            return response
+
+        aiter_bytes = response.aiter_bytes
+        wanted = self._range_length(headers)
+
+        async def teeing_aiter_bytes(chunk_size=None):
+            body = bytearray()
+            stored = False
+            async for chunk in aiter_bytes(chunk_size):
+                body.extend(chunk)
+                if wanted and not stored and len(body) >= wanted:
+                    await asyncio.to_thread(self._store, url, headers, response, bytes(body[:wanted]))
+                    stored = True
+                yield chunk
+            if not stored:
+                await asyncio.to_thread(self._store, url, headers, response, bytes(body))
+
+        response.aiter_bytes = teeing_aiter_bytes
+        return response
+
+    def _cacheable(self, response):
+        # 206 is safe to cache because Range is part of the cache key
+        if response.status_code not in (200, 206):
+            return False
+        return "no-store" not in response.headers.get("Cache-Control", "").lower()
+
+    def _range_length(self, headers):
+        """Bytes asked for by a "Range: bytes=0-N" request header, or None"""
+        match = re.fullmatch(r"\s*bytes=0-(\d+)\s*", CaseInsensitiveDict(headers or {}).get("range", ""))
+        return int(match.group(1)) + 1 if match else None
+
+    def _store(self, url, headers, response, body):
+        stored_headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in DROPPED_HEADERS
+        }
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(url, headers), url, urllib.parse.urlsplit(url).netloc, response.status_code,
+                 json.dumps(stored_headers), body, len(body), now, now)
+            )
+            self.counters["stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes (lock held)"""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.counters["evictions"] += 1
+
+    def to_response(self, entry):
+        """Rebuild a requests.Response from a cache entry"""
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["body"]
+        # Lets iter_content() serve the stored body to streaming callers
+        response._content_consumed = True
+        response.url = entry["url"]
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+    def stats(self):
+        """Hit ratio, bytes saved and on-disk size of the cache"""
+        with self._lock:
+            counters = dict(self.counters)
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+        lookups = counters["hits"] + counters["revalidated"] + counters["misses"]
+        counters["hit_ratio"] = round((counters["hits"] + counters["revalidated"]) / lookups, 3) if lookups else 0.0
+        counters["entries"] = entries
+        counters["size_bytes"] = size
+        return counters
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._db.close()
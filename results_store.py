@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Compact append-only store for research results
+
+Each run is appended to a monthly segment (results-YYYYMM.jsonl.gz) as its
+own gzip member holding one JSON line. Sources are stored column by column,
+with the repetitive source, type and model values interned in a shared
+dictionary. A plain-text manifest records where every run lives and what
+it contains, so scans filtered by query, source or date only decompress
+the runs that match. Appends take a lock file, so several processes can
+write to the same store.
+
+Usage:
+    python results_store.py migrate --from . --store research_store
+    python results_store.py scan --store research_store --source arXiv --since 20260101
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from analysis_cache import normalize_query
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Source fields stored as ids into the dictionary
+INTERNED_FIELDS = ('source', 'type', 'model')
+
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+
+class ResultsStore:
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Holds the segments, manifest.jsonl and dictionary.json
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.manifest_path = os.path.join(directory, "manifest.jsonl")
+        self.dictionary_path = os.path.join(directory, "dictionary.json")
+        self.lock_path = os.path.join(directory, "store.lock")
+
+        self._lock = threading.Lock()
+
+        self._strings = []
+        self._ids = {}
+        self._dictionary_stat = None
+        self._manifest = []
+        self._manifest_size = 0
+
+        with self._lock:
+            self._refresh()
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold the store's lock file, shared with other processes (thread lock held)"""
+        with open(self.lock_path, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        f.seek(0)
+                        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.05)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _refresh(self):
+        """Pick up dictionary strings and runs appended by other processes (lock held)"""
+        try:
+            stat = os.stat(self.dictionary_path)
+            stat = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and stat != self._dictionary_stat:
+            # The dictionary only grows, so ids already handed out keep their strings
+            with open(self.dictionary_path, 'r', encoding='utf-8') as f:
+                self._strings = json.load(f)
+            self._ids = {value: i for i, value in enumerate(self._strings)}
+            self._dictionary_stat = stat
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'rb') as f:
+                f.seek(self._manifest_size)
+                data = f.read()
+            # A line still being written by another process is read next time
+            complete = data[:data.rfind(b"\n") + 1]
+            self._manifest.extend(json.loads(line) for line in complete.decode('utf-8').splitlines() if line.strip())
+            self._manifest_size += len(complete)
+
+    def _intern(self, value):
+        """Dictionary id of value, adding it if new (lock held)"""
+        if value is None:
+            return None
+        if value not in self._ids:
+            self._ids[value] = len(self._strings)
+            self._strings.append(value)
+        return self._ids[value]
+
+    def append(self, query, timestamp, sources, failures=None, report_file=None, origin=None, report=None):
+        """
+        Append one run
+
+        Args:
+            query (str): Research query
+            timestamp (str): Run timestamp (YYYYmmdd_HHMMSS)
+            sources (list): Analyzed source records
+            failures (list): Sources that failed during the fetch
+            report_file (str): Name of the matching text report
+            origin (str): File the run was migrated from, if any
+            report (str): Full report text, for data files that embedded it
+
+        Returns:
+            int: Run id
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+
+            fields = list(dict.fromkeys(field for source in sources for field in source))
+            columns = {}
+            absent = {}
+            for field in fields:
+                values = [source.get(field) for source in sources]
+                if field in INTERNED_FIELDS:
+                    values = [self._intern(value) for value in values]
+                columns[field] = values
+                # Rows without the field, told apart from rows holding None
+                missing = [i for i, source in enumerate(sources) if field not in source]
+                if missing:
+                    absent[field] = missing
+
+            # Keep the dictionary ahead of the data that refers to it, replaced
+            # in one step so readers in other processes never see half of it
+            temporary_path = f"{self.dictionary_path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'w', encoding='utf-8') as f:
+                json.dump(self._strings, f, ensure_ascii=False)
+            os.replace(temporary_path, self.dictionary_path)
+            stat = os.stat(self.dictionary_path)
+            self._dictionary_stat = (stat.st_mtime_ns, stat.st_size)
+
+            record = {
+                'query': query,
+                'timestamp': timestamp,
+                'failures': failures or [],
+                'report_file': report_file,
+                'rows': len(sources),
+                'columns': columns,
+                'absent': absent
+            }
+            if report is not None:
+                record['report'] = report
+            member = gzip.compress((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+
+            segment = f"results-{timestamp[:6]}.jsonl.gz"
+            segment_path = os.path.join(self.directory, segment)
+            with open(segment_path, 'ab') as f:
+                offset = f.tell()
+                f.write(member)
+
+            entry = {
+                'id': len(self._manifest),
+                'segment': segment,
+                'offset': offset,
+                'length': len(member),
+                'query': query,
+                'normalized_query': normalize_query(query),
+                'timestamp': timestamp,
+                'rows': len(sources),
+                'sources': sorted({self._ids[s['source']] for s in sources if s.get('source') is not None}),
+                'origin': origin
+            }
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+            with open(self.manifest_path, 'ab') as f:
+                f.write(line)
+            self._manifest.append(entry)
+            self._manifest_size += len(line)
+
+            return entry['id']
+
+    def _timestamp(self, value):
+        if isinstance(value, datetime):
+            return value.strftime(TIMESTAMP_FORMAT)
+        return value
+
+    def runs(self, query=None, source=None, since=None, until=None):
+        """
+        Manifest entries of the runs matching every given filter, oldest first
+
+        Args:
+            query (str): Research query (compared normalized)
+            source (str): Platform label, e.g. "arXiv"
+            since (str|datetime): Earliest run timestamp, inclusive
+            until (str|datetime): Latest run timestamp, exclusive
+        """
+        wanted = normalize_query(query) if query is not None else None
+        since, until = self._timestamp(since), self._timestamp(until)
+
+        with self._lock:
+            self._refresh()
+            source_id = self._ids.get(source, -1) if source is not None else None
+            entries = list(self._manifest)
+
+        return [
+            entry for entry in entries
+            if (wanted is None or entry['normalized_query'] == wanted)
+            and (source_id is None or source_id in entry['sources'])
+            and (since is None or entry['timestamp'] >= since)
+            and (until is None or entry['timestamp'] < until)
+        ]
+
+    def load_run(self, entry):
+        """
+        Read one run back in the trusted_data_*.json layout
+
+        Returns:
+            dict: query, timestamp, sources, failures and report_file, plus
+            report for migrated data files that embedded the report text
+        """
+        with open(os.path.join(self.directory, entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            record = json.loads(gzip.decompress(f.read(entry['length'])))
+
+        with self._lock:
+            if any(i is not None and i >= len(self._strings)
+                   for field in INTERNED_FIELDS for i in record['columns'].get(field, [])):
+                self._refresh()
+            strings = list(self._strings)
+
+        columns = record.pop('columns')
+        for field in INTERNED_FIELDS:
+            if field in columns:
+                columns[field] = [strings[i] if i is not None else None for i in columns[field]]
+
+        # Fields a source didn't have are left out; runs stored before
+        # 'absent' was recorded can't tell them from None values
+        absent = record.get('absent')
+        if absent is None:
+            sources = [
+                {field: values[i] for field, values in columns.items() if values[i] is not None}
+                for i in range(record['rows'])
+            ]
+        else:
+            absent = {field: set(rows) for field, rows in absent.items()}
+            sources = [
+                {field: values[i] for field, values in columns.items() if i not in absent.get(field, ())}
+                for i in range(record['rows'])
+            ]
+
+        run = {
+            'query': record['query'],
+            'timestamp': record['timestamp'],
+            'sources': sources,
+            'failures': record['failures'],
+            'report_file': record['report_file']
+        }
+        if 'report' in record:
+            run['report'] = record['report']
+        return run
+
+    def scan(self, query=None, source=None, since=None, until=None):
+        """
+        Yield every stored source matching the filters
+
+        Each source gets the 'query' and 'timestamp' of its run. Runs outside
+        the filters are skipped without being decompressed.
+        """
+        for entry in self.runs(query, source, since, until):
+            run = self.load_run(entry)
+            for record in run['sources']:
+                if source is None or record.get('source') == source:
+                    yield dict(record, query=run['query'], timestamp=run['timestamp'])
+
+    def latest(self, query):
+        """Most recent run saved for query, or None"""
+        entries = self.runs(query)
+        if not entries:
+            return None
+        return self.load_run(max(entries, key=lambda entry: entry['timestamp']))
+
+    def migrated_files(self):
+        """Names of the data files already migrated into the store"""
+        with self._lock:
+            self._refresh()
+            return {entry['origin'] for entry in self._manifest if entry.get('origin')}
+
+    def migrate(self, data_dir=".", delete=False):
+        """
+        Append every trusted_data_*.json in data_dir not migrated yet
+
+        Args:
+            data_dir (str): Directory holding the JSON data files
+            delete (bool): Remove each file once it is in the store
+
+        Returns:
+            int: Number of files migrated
+        """
+        done = self.migrated_files()
+        migrated = 0
+
+        for path in sorted(glob.glob(os.path.join(data_dir, "trusted_data_*.json"))):
+            name = os.path.basename(path)
+            if name not in done:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning("⚠️ Skipping unreadable data file %s: %s", path, e)
+                    continue
+
+                # Early data files embedded the whole report, which may be its only copy
+                self.append(data.get('query', ''), data.get('timestamp') or name[13:28], data.get('sources', []),
+                            data.get('failures'), data.get('report_file'), origin=name, report=data.get('report'))
+                migrated += 1
+
+            if delete:
+                os.remove(path)
+
+        return migrated
+
+    def stats(self):
+        """Size of the store"""
+        segments = glob.glob(os.path.join(self.directory, "results-*.jsonl.gz"))
+        with self._lock:
+            self._refresh()
+            return {
+                'runs': len(self._manifest),
+                'sources': sum(entry['rows'] for entry in self._manifest),
+                'segments': len(segments),
+                'bytes': sum(os.path.getsize(path) for path in segments)
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact store for research results")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="Move trusted_data_*.json files into the store")
+    migrate.add_argument("--from", dest="data_dir", default=".", help="Directory of the JSON data files")
+    migrate.add_argument("--store", default="research_store", help="Store directory (default: research_store)")
+    migrate.add_argument("--delete", action="store_true", help="Delete each JSON file once migrated")
+
+    scan = commands.add_parser("scan", help="Print stored sources as JSON lines")
+    scan.add_argument("--store", default="research_store", help="Store directory (default: research_store)")
+    scan.add_argument("--query", help="Only runs for this query")
+    scan.add_argument("--source", help="Only sources from this platform")
+    scan.add_argument("--since", help="Only runs at or after this timestamp (YYYYmmdd[_HHMMSS])")
+    scan.add_argument("--until", help="Only runs before this timestamp (YYYYmmdd[_HHMMSS])")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    store = ResultsStore(args.store)
+
+    if args.command == "migrate":
+        migrated = store.migrate(args.data_dir, delete=args.delete)
+        print(f"📦 Migrated {migrated} data files: {store.stats()}")
+    else:
+        for record in store.scan(args.query, args.source, args.since, args.until):
+            print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,647 @@
+"""
+Provider adapters for the trusted sources researcher
+
+Every entry of TrustedSourcesResearcher.trusted_sources names an adapter
+through its "type" field (xml_api, json_api, rss_feed, ...). The adapter
+builds the requests from the entry's search_url and parses the responses,
+and declares the rate and concurrency limits the scheduler must respect
+(rate limits are shared by every adapter with the same rate_key).
+A new provider of an existing type is added with configuration only.
+
+Adapters don't perform I/O themselves. search() is a generator that yields
+a SourceRequest, receives the response (anything with status_code,
+content, headers and json()) and finally returns the parsed results, so
+the same parsing code can be driven by blocking or asynchronous clients.
+For a SourceRequest with stream=True the body isn't read up front: the
+generator yields NEXT_CHUNK to receive the body chunk by chunk (b'' at its
+end) and may return before the end, which abandons the rest of the body.
+Adapters whose bodies are bounded by max_results (arXiv) set
+cache_drain_bytes, and with a response cache the drivers read up to that
+much of the rest so the cache can store the body.
+"""
+
+import re
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from bs4 import BeautifulSoup
+
+SourceRequest = namedtuple('SourceRequest', ['url', 'headers', 'stream'], defaults=[False])
+
+# Yielded by a search generator to receive the next chunk of a streamed body
+NEXT_CHUNK = object()
+
+# Bytes per chunk of a streamed body
+CHUNK_SIZE = 16 * 1024
+
+
+class SearchCancelled(Exception):
+    """Raised by run_search when its cancel event is set"""
+
+
+class SourceError(Exception):
+    """A source answered a search with an error status and no results"""
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+# Adapter classes by source type
+SOURCE_ADAPTERS = {}
+
+
+def register_adapter(source_type):
+    """Class decorator registering an adapter for a trusted_sources "type" value"""
+    def decorator(cls):
+        cls.source_type = source_type
+        SOURCE_ADAPTERS[source_type] = cls
+        return cls
+    return decorator
+
+
+def create_adapter(key, config):
+    """Instantiate the adapter registered for config['type']"""
+    source_type = config.get('type')
+    adapter_class = SOURCE_ADAPTERS.get(source_type)
+    if adapter_class is None:
+        raise ValueError(f"No adapter registered for source type {source_type!r} (source {key!r})")
+    return adapter_class(key, config)
+
+
+class _ParseTimer:
+    """Time a search generator spends parsing, and the body bytes it is fed"""
+
+    def __init__(self):
+        self.started_ns = None
+        self.elapsed_ns = 0
+        self.bytes = 0
+
+    def send(self, search, reply):
+        started = time.perf_counter_ns()
+        if self.started_ns is None:
+            self.started_ns = started
+        try:
+            return search.send(reply)
+        finally:
+            self.elapsed_ns += time.perf_counter_ns() - started
+
+    def record(self, tracer):
+        """Add the parse time as one 'parse' span (not counting the waits for the body)"""
+        if tracer is not None and self.started_ns is not None:
+            tracer.record('parse', self.started_ns, self.started_ns + self.elapsed_ns, bytes=self.bytes)
+
+
+def run_search(search, fetch, tracer=None, cancel_event=None, drain_bytes=0):
+    """
+    Drive an adapter search generator with a blocking fetch(request) function
+
+    fetch(request) must honour request.stream; streamed responses are read
+    with iter_content() as the generator asks for chunks, and closed when
+    the search moves on or finishes. When the search returns before the end
+    of a body, up to drain_bytes more are read so a response cache teeing
+    the body can store it; a longer body is abandoned. With a tracer, the
+    parsing time is recorded as a 'parse' span. Setting cancel_event stops
+    the search before its next request or chunk, raising SearchCancelled.
+
+    Returns:
+        list: The parsed results
+    """
+    streamed, chunks = None, None
+    timer = _ParseTimer()
+    try:
+        request = next(search)
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise SearchCancelled()
+
+            if request is NEXT_CHUNK:
+                reply = next(chunks, b'') if chunks is not None else b''
+                timer.bytes += len(reply)
+            else:
+                if streamed is not None:
+                    streamed.close()
+                    streamed, chunks = None, None
+
+                reply = fetch(request)
+                if request.stream:
+                    streamed, chunks = reply, reply.iter_content(CHUNK_SIZE)
+                else:
+                    timer.bytes += len(reply.content)
+
+            request = timer.send(search, reply)
+    except StopIteration as stop:
+        if chunks is not None and drain_bytes:
+            drained = 0
+            for chunk in chunks:
+                drained += len(chunk)
+                if drained > drain_bytes:
+                    break
+        return stop.value or []
+    finally:
+        if streamed is not None:
+            streamed.close()
+        timer.record(tracer)
+
+
+async def run_search_async(search, fetch, tracer=None, drain_bytes=0):
+    """
+    Drive an adapter search generator with an async fetch(request) function
+
+    fetch(request) must honour request.stream; streamed responses are read
+    with aiter_bytes() (as httpx responses are), drained up to drain_bytes
+    like in run_search and closed with aclose(). With a tracer, the parsing
+    time is recorded as a 'parse' span.
+
+    Returns:
+        list: The parsed results
+    """
+    streamed, chunks = None, None
+    timer = _ParseTimer()
+    try:
+        request = next(search)
+        while True:
+            if request is NEXT_CHUNK:
+                reply = await anext(chunks, b'') if chunks is not None else b''
+                timer.bytes += len(reply)
+            else:
+                if streamed is not None:
+                    await streamed.aclose()
+                    streamed, chunks = None, None
+
+                reply = await fetch(request)
+                if request.stream:
+                    streamed, chunks = reply, aiter(reply.aiter_bytes(CHUNK_SIZE))
+                else:
+                    timer.bytes += len(reply.content)
+
+            request = timer.send(search, reply)
+    except StopIteration as stop:
+        if chunks is not None and drain_bytes:
+            drained = 0
+            async for chunk in chunks:
+                drained += len(chunk)
+                if drained > drain_bytes:
+                    break
+        return stop.value or []
+    finally:
+        if streamed is not None:
+            await streamed.aclose()
+        timer.record(tracer)
+
+
+def clean_text(text):
+    """Collapse whitespace runs into single spaces"""
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+
+def html_to_text(html):
+    """Plain text of an HTML fragment"""
+    if not html:
+        return ''
+    return clean_text(BeautifulSoup(html, 'html.parser').get_text(' '))
+
+
+def lookup(data, path):
+    """Follow a dotted path through dicts, mapping over lists on the way"""
+    for part in path.split('.'):
+        if isinstance(data, list):
+            return [lookup(item, part) for item in data]
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+class SourceAdapter:
+    """Base adapter: one GET of the formatted search_url, parsed by parse()"""
+
+    # Defaults, overridable per source with the same keys in trusted_sources
+    rate_limit = 1.0        # requests per second
+    burst = 1               # requests allowed back to back before rate_limit applies
+    rate_key = None         # rate limiter bucket, defaults to the search_url host
+    max_concurrency = 2     # requests in flight at once
+    timeout = 10            # seconds per request
+    result_type = 'article'
+    cache_drain_bytes = 0   # rest of a streamed body read for the response cache after the search stops
+
+    def __init__(self, key, config):
+        self.key = key
+        self.config = config
+        self.name = config.get('name', key)
+        # Short platform name stored on every result
+        self.label = config.get('label', self.name)
+        self.rate_limit = config.get('rate_limit', self.rate_limit)
+        self.burst = config.get('burst', self.burst)
+        self.rate_key = config.get('rate_key') or self.rate_key or urllib.parse.urlsplit(config['search_url']).netloc
+        self.max_concurrency = config.get('max_concurrency', self.max_concurrency)
+        self.timeout = config.get('timeout', self.timeout)
+        self.result_type = config.get('result_type', self.result_type)
+        self.cache_drain_bytes = config.get('cache_drain_bytes', self.cache_drain_bytes)
+        self.headers = dict(config.get('headers', {}))
+
+    def build_url(self, query, max_results, since=None):
+        """Fill the configured search_url template"""
+        return self.config['search_url'].format(query=urllib.parse.quote(query), max_results=max_results)
+
+    def search(self, query, max_results, since=None):
+        """Generator yielding SourceRequests and returning the parsed results"""
+        response = yield SourceRequest(self.build_url(query, max_results, since), self.headers)
+        if response.status_code != 200:
+            return []
+        return self.parse(response, query, max_results, since)[:max_results]
+
+    def parse(self, response, query, max_results, since=None):
+        raise NotImplementedError
+
+    def read_xml(self, parser, tags):
+        """
+        Sub-generator (use with yield from) feeding the next chunk of a
+        streamed body to an XMLPullParser
+
+        Returns:
+            tuple: (elements completed in this chunk whose tag is in tags,
+            True once the body is exhausted)
+        """
+        chunk = yield NEXT_CHUNK
+        if chunk:
+            parser.feed(chunk)
+        else:
+            parser.close()
+
+        elements = [element for _, element in parser.read_events() if element.tag in tags]
+        return elements, not chunk
+
+    def make_result(self, title, url, content, **extra):
+        result = {
+            'title': title,
+            'url': url,
+            'content': content,
+            'source': self.label,
+            'type': self.result_type
+        }
+        result.update(extra)
+        return result
+
+
+@register_adapter('xml_api')
+class ArxivAdapter(SourceAdapter):
+    """arXiv Atom API"""
+
+    # arXiv asks for at most one request every 3 seconds
+    rate_limit = 1 / 3
+    max_concurrency = 1
+    # Feeds hold at most max_results entries, so caching them costs little
+    cache_drain_bytes = 256 * 1024
+    result_type = 'academic_paper'
+
+    def build_url(self, query, max_results, since=None):
+        url = super().build_url(query, max_results, since)
+        if since:
+            url += "&sortBy=submittedDate&sortOrder=descending"
+        return url
+
+    def search(self, query, max_results, since=None):
+        """Parse the Atom feed as it streams in, stopping once max_results entries are read"""
+        response = yield SourceRequest(self.build_url(query, max_results, since), self.headers, stream=True)
+        if response.status_code != 200:
+            return []
+
+        results = []
+        parser = ET.XMLPullParser(events=('end',))
+        done = False
+
+        while not done and len(results) < max_results:
+            entries, done = yield from self.read_xml(parser, (f'{ATOM}entry',))
+
+            for entry in entries:
+                published = entry.find(f'{ATOM}published')
+                if since and published is not None:
+                    published_at = datetime.fromisoformat(published.text.strip().replace('Z', '+00:00'))
+                    if published_at <= since:
+                        # Sorted newest first, so everything after this is older too
+                        return results
+
+                results.append(self.make_result(
+                    entry.find(f'{ATOM}title').text.strip(),
+                    entry.find(f'{ATOM}id').text.strip(),
+                    clean_text(entry.find(f'{ATOM}summary').text)
+                ))
+                entry.clear()
+
+                if len(results) >= max_results:
+                    break
+
+        return results
+
+
+@register_adapter('json_api')
+class JsonApiAdapter(SourceAdapter):
+    """
+    Generic JSON search API
+
+    Config keys:
+        results_path: dotted path to the list of hits
+        field_map: result field -> dotted path inside a hit (title, url,
+            content and any extra fields; paths map over lists)
+        require_content: skip hits without content (default True)
+        since_param: query parameter receiving "YYYY-MM-DD:" for incremental runs
+    """
+
+    def build_url(self, query, max_results, since=None):
+        url = super().build_url(query, max_results, since)
+        if since and self.config.get('since_param'):
+            url += f"&{self.config['since_param']}={since.strftime('%Y-%m-%d')}:"
+        return url
+
+    def parse(self, response, query, max_results, since=None):
+        field_map = dict(self.config.get('field_map', {}))
+        title_path = field_map.pop('title', 'title')
+        url_path = field_map.pop('url', 'url')
+        content_path = field_map.pop('content', 'content')
+
+        results = []
+        for hit in lookup(response.json(), self.config.get('results_path', 'data')) or []:
+            content = lookup(hit, content_path)
+            if not content and self.config.get('require_content', True):
+                continue
+
+            extra = {field: lookup(hit, path) for field, path in field_map.items()}
+            results.append(self.make_result(
+                lookup(hit, title_path) or 'No title',
+                lookup(hit, url_path) or '',
+                content or '',
+                **extra
+            ))
+
+        return results
+
+
+@register_adapter('wiki_api')
+class WikiApiAdapter(SourceAdapter):
+    """MediaWiki action API with generator=search and prop=extracts|info"""
+
+    rate_limit = 5.0
+    burst = 5
+    max_concurrency = 2
+    result_type = 'encyclopedia'
+
+    def parse(self, response, query, max_results, since=None):
+        pages = response.json().get('query', {}).get('pages', [])
+
+        # Pages come back unordered; 'index' is the search rank
+        return [
+            self.make_result(page.get('title', ''), page.get('fullurl', ''), page.get('extract', ''))
+            for page in sorted(pages, key=lambda p: p.get('index', 0))
+        ]
+
+
+@register_adapter('github_api')
+class GithubApiAdapter(SourceAdapter):
+    """GitHub repository search; READMEs are added later by the enrichment stage"""
+
+    # Unauthenticated search allows 10 requests a minute, counted apart
+    # from the rest of the API
+    rate_limit = 10 / 60
+    burst = 10
+    rate_key = 'api.github.com/search'
+    max_concurrency = 1
+    result_type = 'repository'
+
+    def parse(self, response, query, max_results, since=None):
+        results = []
+        for repo in response.json().get('items', []):
+            description = repo.get('description') or ''
+            results.append(self.make_result(
+                f"{repo.get('name', 'No name')} - {repo.get('full_name', '')}",
+                repo.get('html_url', ''),
+                description,
+                stars=repo.get('stargazers_count', 0),
+                full_name=repo.get('full_name', '')
+            ))
+        return results
+
+
+@register_adapter('reddit_api')
+class RedditApiAdapter(SourceAdapter):
+    """Reddit search listing"""
+
+    rate_limit = 1.0
+    max_concurrency = 1
+    result_type = 'discussion'
+
+    def build_url(self, query, max_results, since=None):
+        url = super().build_url(query, max_results, since)
+        if since:
+            url = url.replace('sort=relevance', 'sort=new')
+        return url
+
+    def parse(self, response, query, max_results, since=None):
+        results = []
+        for post in response.json().get('data', {}).get('children', []):
+            post_data = post.get('data', {})
+
+            if since and post_data.get('created_utc', 0) <= since.timestamp():
+                # Sorted newest first, so everything after this is older too
+                break
+
+            title = post_data.get('title', '')
+            selftext = post_data.get('selftext', '')
+
+            # Combine title and content
+            content = f"{title}\n\n{selftext}" if selftext else title
+
+            if len(content) > 50:  # Only include substantial posts
+                results.append(self.make_result(
+                    title,
+                    f"https://reddit.com{post_data.get('permalink', '')}",
+                    content,
+                    subreddit=post_data.get('subreddit', ''),
+                    # Link posts point at the page being discussed
+                    link='' if post_data.get('is_self', True) else post_data.get('url', '')
+                ))
+        return results
+
+
+@register_adapter('stack_api')
+class StackApiAdapter(SourceAdapter):
+    """Stack Exchange search (the withbody filter includes question bodies)"""
+
+    rate_limit = 5.0
+    max_concurrency = 2
+    result_type = 'qa'
+
+    def parse(self, response, query, max_results, since=None):
+        results = []
+        for item in response.json().get('items', []):
+            created = item.get('creation_date', 0)
+            if since and created <= since.timestamp():
+                continue
+
+            title = html_to_text(item.get('title', ''))
+            body = html_to_text(item.get('body', ''))
+            results.append(self.make_result(
+                title,
+                item.get('link', ''),
+                f"{title}\n\n{body}" if body else title,
+                score=item.get('score', 0),
+                answered=item.get('is_answered', False)
+            ))
+        return results
+
+
+@register_adapter('ncbi_api')
+class NcbiApiAdapter(SourceAdapter):
+    """
+    NCBI E-utilities: esearch for ids, then one efetch for all abstracts
+
+    Config keys:
+        fetch_url: efetch template with {ids}
+    """
+
+    # NCBI allows 3 requests a second without an API key
+    rate_limit = 3.0
+    burst = 3
+    max_concurrency = 1
+    result_type = 'academic_paper'
+
+    def build_url(self, query, max_results, since=None):
+        url = super().build_url(query, max_results, since)
+        if since:
+            url += f"&datetype=pdat&mindate={since.strftime('%Y/%m/%d')}&maxdate=3000"
+        return url
+
+    def search(self, query, max_results, since=None):
+        response = yield SourceRequest(self.build_url(query, max_results, since), self.headers)
+        if response.status_code != 200:
+            return []
+
+        ids = response.json().get('esearchresult', {}).get('idlist', [])[:max_results]
+        if not ids:
+            return []
+
+        response = yield SourceRequest(self.config['fetch_url'].format(ids=','.join(ids)), self.headers)
+        if response.status_code != 200:
+            return []
+
+        return self.parse(response, query, max_results, since)[:max_results]
+
+    def parse(self, response, query, max_results, since=None):
+        results = []
+        root = ET.fromstring(response.content)
+
+        # PMC returns JATS <article> elements
+        for article in root.iter('article'):
+            meta = article.find('front/article-meta')
+            if meta is None:
+                continue
+
+            title = clean_text(''.join(meta.find('title-group/article-title').itertext())) \
+                if meta.find('title-group/article-title') is not None else 'No title'
+            abstract = meta.find('abstract')
+            content = clean_text(' '.join(abstract.itertext())) if abstract is not None else ''
+            pmc_id = meta.findtext("article-id[@pub-id-type='pmc']") or meta.findtext("article-id[@pub-id-type='pmcid']")
+
+            if not content:
+                continue
+
+            pmc_id = (pmc_id or '').upper()
+            if pmc_id and not pmc_id.startswith('PMC'):
+                pmc_id = f"PMC{pmc_id}"
+
+            results.append(self.make_result(
+                title,
+                f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmc_id}/" if pmc_id else '',
+                content
+            ))
+        return results
+
+
+@register_adapter('rss_feed')
+class RssFeedAdapter(SourceAdapter):
+    """
+    RSS 2.0 or Atom feed, filtered locally to the items mentioning the query
+
+    Feeds aren't searchable, so every item is scored by how many query
+    terms appear in its title and description. The feed is parsed as it
+    streams in; reading stops early once max_results items mention every
+    query term, since no later item can rank above them.
+    """
+
+    rate_limit = 1.0
+    max_concurrency = 1
+    result_type = 'news'
+
+    def search(self, query, max_results, since=None):
+        response = yield SourceRequest(self.build_url(query, max_results, since), self.headers, stream=True)
+        if response.status_code != 200:
+            return []
+
+        terms = [t for t in re.findall(r'\w+', query.lower()) if len(t) > 2]
+        parser = ET.XMLPullParser(events=('end',))
+
+        scored = []
+        full_matches = 0
+        position = 0
+        done = False
+
+        while not done and full_matches < max_results:
+            items, done = yield from self.read_xml(parser, ('item', f'{ATOM}entry'))
+
+            for item in items:
+                entry = self.parse_item(item)
+                item.clear()
+                position += 1
+                if entry is None:
+                    continue
+
+                if since and entry['published'] and entry['published'] <= since:
+                    continue
+
+                text = f"{entry['title']} {entry['content']}".lower()
+                score = sum(1 for term in terms if term in text)
+                if score:
+                    scored.append((-score, position, entry))
+                    full_matches += score == len(terms)
+
+        scored.sort(key=lambda s: (s[0], s[1]))
+        return [
+            self.make_result(entry['title'], entry['url'], f"{entry['title']}\n\n{entry['content']}")
+            for _, _, entry in scored[:max_results]
+        ]
+
+    def parse_item(self, item):
+        """Title, link, plain-text description and publish time of an RSS item or Atom entry"""
+        if item.tag == 'item':
+            title = item.findtext('title') or ''
+            url = item.findtext('link') or ''
+            content = html_to_text(item.findtext('description') or '')
+            published = item.findtext('pubDate')
+        else:
+            title = item.findtext(f'{ATOM}title') or ''
+            link = item.find(f'{ATOM}link')
+            url = link.get('href', '') if link is not None else ''
+            content = html_to_text(item.findtext(f'{ATOM}summary') or item.findtext(f'{ATOM}content') or '')
+            published = item.findtext(f'{ATOM}updated') or item.findtext(f'{ATOM}published')
+
+        if not title:
+            return None
+
+        return {
+            'title': clean_text(title),
+            'url': url.strip(),
+            'content': content,
+            'published': self.parse_date(published)
+        }
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        try:
+            if 'T' in value:
+                return datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+            published = parsedate_to_datetime(value.strip())
+            return published if published.tzinfo else published.replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            return None
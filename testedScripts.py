@@ -3,6 +3,8 @@
 Test script for trusted sources research
 """
 
+import logging
+
 from trusted_sources_researcher import TrustedSourcesResearcher
 
 def test_individual_sources():
@@ -105,7 +107,8 @@ def compare_approaches():
 def quick_demo():
     """Quick demonstration"""
     
-    researcher = TrustedSourcesResearcher(model_name="mistral:7b-instruct-q4_0")
+    # One analysis at a time so the streamed output doesn't interleave
+    researcher = TrustedSourcesResearcher(model_name="mistral:7b-instruct-q4_0", max_in_flight=1)
     
     print("\n⚡ QUICK DEMO")
     print("="*40)
@@ -116,10 +119,23 @@ def quick_demo():
     
     print(f"\n🔍 Researching: {query}")
     
+    current = {'title': None}
+    
+    def show_token(source, text):
+        if text is None:
+            # A model failed mid-reply; its partial text is replaced by the next attempt
+            print("\n↩️ Retrying with another model...", flush=True)
+            return
+        if source['title'] != current['title']:
+            current['title'] = source['title']
+            print(f"\n💭 {source['title'][:50]}...")
+        print(text, end="", flush=True)
+    
     report = researcher.conduct_research(
         query=query,
         categories=['academic', 'general'],
-        max_sources_per_category=1
+        max_sources_per_category=1,
+        on_token=show_token
     )
     
     if report:
@@ -136,8 +152,13 @@ def quick_demo():
         print(f"   • Total lines: {len(lines)}")
         print(f"   • Max line width: {max(len(line) for line in lines)}")
         print(f"   • Files saved with timestamp")
+        
+        for model, stats in researcher.model_latency_stats().items():
+            print(f"   • {model}: first token {stats['avg_time_to_first_token']}s, "
+                  f"{stats['tokens_per_sec']} tokens/sec, {stats['avg_latency']}s per analysis")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("🔬 TRUSTED SOURCES RESEARCH TESTER")
     print("="*60)
     
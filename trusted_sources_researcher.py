@@ -1,53 +1,182 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import json
-from datetime import datetime
-from bs4 import BeautifulSoup
+import glob
+import logging
+from datetime import datetime, timezone
 import ollama
 import urllib.parse
 import re
+import os
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from response_cache import ResponseCache
+from analysis_cache import AnalysisCache, normalize_query
+from report_writer import ReportWriter, iter_report
+from model_manager import ModelManager
+from source_registry import create_adapter, run_search, SearchCancelled, SourceError
+from rate_limiter import RateLimitScheduler, THROTTLE_STATUSES
+from dedup import deduplicate, normalize_url
+from relevance import rank_results
+from embedding_index import EmbeddingIndex, META_FIELDS
+from results_store import ResultsStore
+from chunking import estimate_tokens, context_window, input_budget, split_into_chunks, pack
+from instrumentation import Tracer
+from adaptive_fetch import AdaptiveFetch
+
+logger = logging.getLogger(__name__)
+
+# Unauthenticated GitHub REST API (used for READMEs): 60 requests an hour
+GITHUB_API_RATE = 60 / 3600
+GITHUB_API_BURST = 60
+
+# Bump whenever the analysis prompts change so cached analyses are not reused
+ANALYSIS_PROMPT_VERSION = 2
 
 class TrustedSourcesResearcher:
-    def __init__(self, model_name="tinyllama"):
+    def __init__(self, model_name="tinyllama", max_workers=5, fetch_deadline=30,
+                 max_in_flight=2, batch_max_tokens=None,
+                 pool_connections=2, pool_maxsize=10, max_retries=3, backoff_factor=0.5,
+                 cache_dir=None, output_dir=".", ollama_host=None, keep_alive="10m",
+                 enrichment_budget=5, readme_max_bytes=8192, max_throttle_retries=2,
+                 dedup_threshold=0.8, relevance_top_k=None, min_relevance=0.0,
+                 index_dir=None, recall_top_k=5, recall_min_similarity=0.3, store_dir=None,
+                 trace=False, profile_stages=(), trace_memory=False, url_rewriter=None,
+                 adaptive_target=None, adaptive_min_relevance=0.3, adaptive_max_depth=10,
+                 adaptive_time_budget=None, trace_max_spans=None):
         self.model_name = model_name
         
-        # Trusted, accessible sources by category
+        # Ollama client plus the manager choosing which model each prompt
+        # goes to (model_name first, then the fallbacks)
+        self.llm = ollama.Client(host=ollama_host)
+        self.models = ModelManager(self.llm, model_name, keep_alive=keep_alive)
+        
+        # Where reports and trusted_data_*.json files are written and read back;
+        # with store_dir the data goes to a compact results store instead
+        self.output_dir = output_dir
+        self.store = ResultsStore(store_dir) if store_dir else None
+        
+        # Optional on-disk caches for provider responses and LLM analyses
+        self.cache_dir = cache_dir
+        self.response_cache = ResponseCache(os.path.join(cache_dir, "responses.sqlite3")) if cache_dir else None
+        self.analysis_cache = AnalysisCache(os.path.join(cache_dir, "analyses.sqlite3")) if cache_dir else None
+        
+        # Optional vector index of every analyzed source saved so far, used
+        # to recall similar prior results before fetching
+        self.index = EmbeddingIndex(index_dir) if index_dir else None
+        self.recall_top_k = recall_top_k
+        self.recall_min_similarity = recall_min_similarity
+        
+        # Optional url_rewriter(url) -> url applied to every request that goes
+        # out (e.g. to a local replay server); cache keys, rate limits and
+        # sessions still follow the original URL
+        self.url_rewriter = url_rewriter
+        
+        # One pooled keep-alive session per provider host, created on first use
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        
+        # Concurrent fan-out settings: max sources queried at once and
+        # the wall-clock budget (seconds) for the whole fetch stage
+        self.max_workers = max_workers
+        self.fetch_deadline = fetch_deadline
+        
+        # Adaptive concurrent fetch: stop once adaptive_target unique results
+        # score at least adaptive_min_relevance, cancelling the searches still
+        # running; if a round ends short of it, sources that returned a full
+        # page are searched again with twice the depth (up to
+        # adaptive_max_depth). adaptive_time_budget (seconds) bounds the
+        # whole fetch, defaulting to fetch_deadline. None disables it.
+        self.adaptive_target = adaptive_target
+        self.adaptive_min_relevance = adaptive_min_relevance
+        self.adaptive_max_depth = adaptive_max_depth
+        self.adaptive_time_budget = adaptive_time_budget
+        self.last_fetch_stats = None
+        
+        # GitHub README enrichment: time budget (seconds) for the stage and
+        # bytes read from each README
+        self.enrichment_budget = enrichment_budget
+        self.readme_max_bytes = readme_max_bytes
+        
+        # Estimated content similarity above which results from different
+        # platforms are collapsed into one before analysis
+        self.dedup_threshold = dedup_threshold
+        self.last_dedup_stats = None
+        
+        # Relevance pruning before analysis: analyze at most relevance_top_k
+        # candidates (None for all) scoring at least min_relevance (0..1)
+        self.relevance_top_k = relevance_top_k
+        self.min_relevance = min_relevance
+        
+        # Analysis settings: max concurrent ollama.chat requests (shared by
+        # every analysis running on this researcher) and the token budget
+        # for one batched prompt (None fills the model's context window)
+        self.max_in_flight = max_in_flight
+        self.batch_max_tokens = batch_max_tokens
+        self._llm_slots = threading.BoundedSemaphore(max_in_flight)
+        self._stats_lock = threading.Lock()
+        self.llm_counters = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'model_seconds': 0.0}
+        self.analysis_stats = {}
+        
+        # Per-model latency totals, see model_latency_stats()
+        self.model_metrics = {}
+        
+        # Spans for every stage of a run (fetch, parse, LLM calls, report,
+        # save), exportable with tracer.export_chrome_trace/export_otel.
+        # Stages in profile_stages also run under cProfile. trace_max_spans
+        # bounds the spans kept by long-running processes.
+        self.tracer = Tracer(trace, profile_stages, trace_memory, trace_max_spans)
+        
+        # Trusted, accessible sources by category. "type" selects the adapter
+        # in source_registry.py; search_url is filled with {query} and
+        # {max_results}. rate_limit (requests/sec) and max_concurrency can be
+        # set here to override the adapter defaults.
         self.trusted_sources = {
             "academic": {
                 "arxiv": {
                     "name": "arXiv",
-                    "search_url": "http://export.arxiv.org/api/query?search_query=all:{query}&start=0&max_results=5",
+                    "search_url": "http://export.arxiv.org/api/query?search_query=all:{query}&start=0&max_results={max_results}",
                     "type": "xml_api",
                     "description": "Open access research papers"
                 },
                 "pubmed": {
                     "name": "PubMed Central (Open Access)",
-                    "search_url": "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?db=pmc&term={query}&retmax=5&retmode=json",
+                    "label": "PubMed Central",
+                    "search_url": "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?db=pmc&term={query}&retmax={max_results}&retmode=json",
+                    "fetch_url": "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi?db=pmc&id={ids}&retmode=xml",
                     "type": "ncbi_api",
                     "description": "Medical research papers"
                 },
                 "semantic_scholar": {
                     "name": "Semantic Scholar",
-                    "search_url": "https://api.semanticscholar.org/graph/v1/paper/search?query={query}&limit=5&fields=title,url,abstract,openAccessPdf",
+                    "search_url": "https://api.semanticscholar.org/graph/v1/paper/search?query={query}&limit={max_results}&fields=title,url,abstract,openAccessPdf,authors,externalIds",
                     "type": "json_api",
+                    "results_path": "data",
+                    "field_map": {"title": "title", "url": "url", "content": "abstract", "authors": "authors.name",
+                                  "doi": "externalIds.DOI", "arxiv_id": "externalIds.ArXiv"},
+                    "since_param": "publicationDateOrYear",
+                    "result_type": "academic_paper",
                     "description": "Academic papers with abstracts"
                 }
             },
             "news": {
-                "wikipedia": {
-                    "name": "Wikipedia",
-                    "search_url": "https://en.wikipedia.org/api/rest_v1/page/summary/{query}",
-                    "type": "wiki_api",
-                    "description": "Encyclopedia articles"
-                },
                 "reuters": {
                     "name": "Reuters RSS",
+                    "label": "Reuters",
                     "search_url": "https://www.reuters.com/arc/outboundfeeds/rss/category/technology/?outputType=xml",
                     "type": "rss_feed",
                     "description": "Technology news"
                 },
                 "bbc": {
                     "name": "BBC RSS Technology",
+                    "label": "BBC",
                     "search_url": "http://feeds.bbci.co.uk/news/technology/rss.xml",
                     "type": "rss_feed", 
                     "description": "BBC Technology news"
@@ -56,233 +185,535 @@ class TrustedSourcesResearcher:
             "tech": {
                 "github": {
                     "name": "GitHub Repositories",
-                    "search_url": "https://api.github.com/search/repositories?q={query}&sort=stars&order=desc&per_page=5",
+                    "label": "GitHub",
+                    "search_url": "https://api.github.com/search/repositories?q={query}&sort=stars&order=desc&per_page={max_results}",
                     "type": "github_api",
                     "description": "Open source projects"
                 },
                 "stackoverflow": {
                     "name": "Stack Overflow",
-                    "search_url": "https://api.stackexchange.com/2.3/search/advanced?order=desc&sort=relevance&q={query}&site=stackoverflow",
+                    "search_url": "https://api.stackexchange.com/2.3/search/advanced?order=desc&sort=relevance&q={query}&site=stackoverflow&pagesize={max_results}&filter=withbody",
                     "type": "stack_api",
                     "description": "Programming Q&A"
                 }
             },
             "general": {
+                "wikipedia": {
+                    "name": "Wikipedia",
+                    "search_url": "https://en.wikipedia.org/w/api.php?action=query&format=json&formatversion=2&generator=search&gsrsearch={query}&gsrlimit={max_results}&prop=extracts|info&exintro=1&explaintext=1&exlimit=max&inprop=url&redirects=1",
+                    "type": "wiki_api",
+                    "description": "Encyclopedia articles"
+                },
                 "reddit": {
                     "name": "Reddit",
-                    "search_url": "https://www.reddit.com/search.json?q={query}&sort=relevance&limit=5",
+                    "search_url": "https://www.reddit.com/search.json?q={query}&sort=relevance&limit={max_results}",
                     "type": "reddit_api",
+                    "headers": {"User-Agent": "ResearchBot/1.0"},
                     "description": "Community discussions"
                 }
             }
         }
+        
+        # Token bucket per provider host. Requests that get throttled
+        # (429/503) are retried up to max_throttle_retries times once the
+        # scheduler's backoff allows it.
+        self.rate_limiter = RateLimitScheduler()
+        self.rate_limiter.configure("api.github.com", GITHUB_API_RATE, GITHUB_API_BURST)
+        self.max_throttle_retries = max_throttle_retries
+        
+        # Provider adapters built from the table, each limited to its own
+        # number of requests in flight
+        self.adapters = {}
+        self._adapter_slots = {}
+        for category_sources in self.trusted_sources.values():
+            for key in category_sources:
+                self.add_source(key)
     
-    def search_arxiv(self, query, max_results=3):
-        """Search arXiv for academic papers"""
-        results = []
-        try:
-            import xml.etree.ElementTree as ET
-            
-            search_url = f"http://export.arxiv.org/api/query?search_query=all:{urllib.parse.quote(query)}&start=0&max_results={max_results}"
-            
-            print(f"🔍 Searching arXiv for: {query}")
-            response = requests.get(search_url, timeout=10)
-            
-            if response.status_code == 200:
-                root = ET.fromstring(response.content)
-                
-                for entry in root.findall('{http://www.w3.org/2005/Atom}entry'):
-                    title = entry.find('{http://www.w3.org/2005/Atom}title').text.strip()
-                    summary = entry.find('{http://www.w3.org/2005/Atom}summary').text.strip()
-                    link = entry.find('{http://www.w3.org/2005/Atom}id').text.strip()
-                    
-                    # Clean up the summary
-                    summary = re.sub(r'\s+', ' ', summary)
-                    
-                    results.append({
-                        'title': title,
-                        'url': link,
-                        'content': summary,
-                        'source': 'arXiv',
-                        'type': 'academic_paper'
-                    })
-                    
-                print(f"✅ Found {len(results)} arXiv papers")
+    def add_source(self, key):
+        """(Re)build the adapter for a trusted_sources entry after adding or editing it"""
+        for category_sources in self.trusted_sources.values():
+            if key in category_sources:
+                adapter = create_adapter(key, category_sources[key])
+                self.adapters[key] = adapter
+                self._adapter_slots[key] = threading.BoundedSemaphore(adapter.max_concurrency)
+                self.rate_limiter.configure(adapter.rate_key, adapter.rate_limit, adapter.burst)
+                return adapter
+        
+        raise KeyError(f"Source {key!r} is not in trusted_sources")
+    
+    def _session_for(self, url):
+        """Get the pooled session for the host of url"""
+        host = urllib.parse.urlsplit(url).netloc
+        
+        with self._sessions_lock:
+            session = self._sessions.get(host)
+            if session is None:
+                retry = Retry(
+                    total=self.max_retries,
+                    backoff_factor=self.backoff_factor,
+                    # 429/503 are left to the rate limiter's adaptive backoff
+                    status_forcelist=[500, 502, 504],
+                    allowed_methods=["GET"],
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    max_retries=retry
+                )
                 
-        except Exception as e:
-            print(f"❌ Error searching arXiv: {e}")
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update({
+                    'Accept-Encoding': 'gzip, deflate',
+                    'Connection': 'keep-alive'
+                })
+                self._sessions[host] = session
         
-        return results
+        return session
     
-    def search_wikipedia(self, query):
-        """Search Wikipedia for articles"""
-        results = []
-        try:
-            # First, search for articles
-            search_url = f"https://en.wikipedia.org/api/rest_v1/page/search/{urllib.parse.quote(query)}"
-            
-            print(f"🔍 Searching Wikipedia for: {query}")
-            response = requests.get(search_url, timeout=10)
+    def _http_get(self, url, headers=None, adapter=None, priority=0, **kwargs):
+        """
+        GET url through the pooled session of its host, using the response cache if enabled
+        
+        Network requests wait for the rate limiter (the adapter's rate key,
+        or the host of url); cached answers don't. Lower priority values
+        are served first when requests queue on the same key. Streamed
+        bodies are cached once they have been read to the end.
+        """
+        with self.tracer.span('http', host=urllib.parse.urlsplit(url).netloc) as span:
+            response = self._get(url, headers, adapter, priority, **kwargs)
             
-            if response.status_code == 200:
-                search_data = response.json()
-                
-                # Get details for top results
-                for item in search_data.get('pages', [])[:3]:
-                    page_title = item['title']
-                    
-                    # Get page summary
-                    summary_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{urllib.parse.quote(page_title)}"
-                    summary_response = requests.get(summary_url, timeout=10)
-                    
-                    if summary_response.status_code == 200:
-                        summary_data = summary_response.json()
-                        
-                        results.append({
-                            'title': summary_data.get('title', page_title),
-                            'url': summary_data.get('content_urls', {}).get('desktop', {}).get('page', ''),
-                            'content': summary_data.get('extract', ''),
-                            'source': 'Wikipedia',
-                            'type': 'encyclopedia'
-                        })
-                
-                print(f"✅ Found {len(results)} Wikipedia articles")
-                
-        except Exception as e:
-            print(f"❌ Error searching Wikipedia: {e}")
+            # Streamed bodies aren't read yet; their size is the announced one
+            size = response.headers.get('Content-Length') if kwargs.get('stream') else len(response.content)
+            span.set(status=response.status_code, bytes=int(size) if size else None,
+                     cached=getattr(response, 'from_cache', False))
+            return response
+    
+    def _get(self, url, headers, adapter, priority, **kwargs):
+        """Body of _http_get, outside the span"""
+        session = self._session_for(url)
+        cache = self.response_cache
+        rate_key = adapter.rate_key if adapter else urllib.parse.urlsplit(url).netloc
         
-        return results
+        if cache is None:
+            return self._send(session, url, headers, rate_key, priority, **kwargs)
+        
+        entry = cache.get(url, headers)
+        if entry and entry['fresh']:
+            return cache.hit(entry)
+        
+        request_headers = dict(headers or {})
+        if entry:
+            request_headers.update(cache.conditional_headers(entry))
+        
+        response = self._send(session, url, request_headers, rate_key, priority, **kwargs)
+        
+        if response.status_code == 304 and entry:
+            response.close()
+            return cache.hit(entry, revalidated=True)
+        
+        if kwargs.get('stream'):
+            return cache.tee(url, headers, response)
+        
+        cache.put(url, headers, response)
+        return response
     
-    def search_semantic_scholar(self, query, max_results=3):
-        """Search Semantic Scholar for academic papers"""
-        results = []
-        try:
-            search_url = f"https://api.semanticscholar.org/graph/v1/paper/search?query={urllib.parse.quote(query)}&limit={max_results}&fields=title,url,abstract,openAccessPdf,authors"
+    def _send(self, session, url, headers, rate_key, priority, **kwargs):
+        """Send a request under the rate limiter, retrying throttled answers after backing off"""
+        if self.url_rewriter is not None:
+            url = self.url_rewriter(url)
+        
+        for attempt in range(self.max_throttle_retries + 1):
+            self.rate_limiter.acquire(rate_key, priority)
+            response = session.get(url, headers=headers, **kwargs)
+            self.rate_limiter.update(rate_key, response)
             
-            print(f"🔍 Searching Semantic Scholar for: {query}")
-            response = requests.get(search_url, timeout=10)
+            if response.status_code not in THROTTLE_STATUSES or attempt == self.max_throttle_retries:
+                return response
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                for paper in data.get('data', []):
-                    if paper.get('abstract'):  # Only include papers with abstracts
-                        results.append({
-                            'title': paper.get('title', 'No title'),
-                            'url': paper.get('url', ''),
-                            'content': paper.get('abstract', ''),
-                            'source': 'Semantic Scholar',
-                            'type': 'academic_paper',
-                            'authors': [author.get('name', '') for author in paper.get('authors', [])]
-                        })
-                
-                print(f"✅ Found {len(results)} Semantic Scholar papers")
-                
-        except Exception as e:
-            print(f"❌ Error searching Semantic Scholar: {e}")
+            logger.info("⏳ %s answered %s, backing off", rate_key, response.status_code)
+            response.close()
         
-        return results
+        return response
     
-    def search_github(self, query, max_results=3):
-        """Search GitHub for relevant repositories"""
+    def close(self):
+        """Close every pooled session and the response cache"""
+        with self._sessions_lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        
+        for session in sessions:
+            session.close()
+        
+        if self.response_cache:
+            self.response_cache.close()
+            self.response_cache = None
+        
+        if self.analysis_cache:
+            self.analysis_cache.close()
+            self.analysis_cache = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def search_source(self, key, query, max_results=3, since=None, cancel_event=None, raise_errors=False):
+        """
+        Search one configured source through its adapter
+        
+        Args:
+            key (str): Source key in trusted_sources (e.g. 'arxiv', 'bbc')
+            query (str): Research query
+            max_results (int): Max results to return
+            since (datetime): Only return items newer than this, where the source supports it
+            cancel_event (threading.Event): Abandons the search (and any body
+                still streaming) when set; returns no results
+            raise_errors (bool): Re-raise errors, including a SourceError for an
+                error status without results, instead of returning no results
+        """
+        adapter = self.adapters[key]
+        error_statuses = []
+        
+        def fetch(request):
+            response = self._http_get(request.url, headers=request.headers or None, adapter=adapter,
+                                      timeout=adapter.timeout, stream=request.stream)
+            if response.status_code >= 400:
+                error_statuses.append(response.status_code)
+            return response
+        
         results = []
         try:
-            search_url = f"https://api.github.com/search/repositories?q={urllib.parse.quote(query)}&sort=stars&order=desc&per_page={max_results}"
+            logger.info("🔍 Searching %s for: %s", adapter.name, query)
+            with self._adapter_slots[key], self.tracer.span(f"search:{key}", source=adapter.name) as span:
+                drain_bytes = adapter.cache_drain_bytes if self.response_cache else 0
+                results = run_search(adapter.search(query, max_results, since), fetch, self.tracer, cancel_event,
+                                     drain_bytes)
+                span.set(results=len(results))
             
-            print(f"🔍 Searching GitHub for: {query}")
-            response = requests.get(search_url, timeout=10)
+            if error_statuses and not results:
+                raise SourceError(f"HTTP {error_statuses[-1]}")
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                for repo in data.get('items', []):
-                    description = repo.get('description', '')
-                    readme_content = self.get_github_readme(repo.get('full_name', ''))
-                    
-                    content = f"{description}\n\n{readme_content}" if readme_content else description
-                    
-                    results.append({
-                        'title': f"{repo.get('name', 'No name')} - {repo.get('full_name', '')}",
-                        'url': repo.get('html_url', ''),
-                        'content': content[:1000],  # Limit content length
-                        'source': 'GitHub',
-                        'type': 'repository',
-                        'stars': repo.get('stargazers_count', 0)
-                    })
-                
-                print(f"✅ Found {len(results)} GitHub repositories")
-                
+            logger.info("✅ Found %s %s results", len(results), adapter.name)
+            
+        except SearchCancelled:
+            logger.info("⏹️ Cancelled search of %s", adapter.name)
         except Exception as e:
-            print(f"❌ Error searching GitHub: {e}")
+            logger.error("❌ Error searching %s: %s", adapter.name, e)
+            if raise_errors:
+                raise
         
         return results
     
-    def get_github_readme(self, repo_full_name):
-        """Get README content from GitHub repository"""
+    def search_arxiv(self, query, max_results=3, since=None):
+        """Search arXiv for academic papers, optionally only those submitted after since"""
+        return self.search_source('arxiv', query, max_results, since)
+    
+    def search_wikipedia(self, query, max_results=3):
+        """Search Wikipedia for articles"""
+        return self.search_source('wikipedia', query, max_results)
+    
+    def search_semantic_scholar(self, query, max_results=3, since=None):
+        """Search Semantic Scholar for academic papers, optionally only those published since a date"""
+        return self.search_source('semantic_scholar', query, max_results, since)
+    
+    def search_github(self, query, max_results=3):
+        """
+        Search GitHub for relevant repositories
+        
+        Results only carry the repository description; README excerpts are
+        added separately by enrich_github_readmes.
+        """
+        return self.search_source('github', query, max_results)
+    
+    def enrich_github_readmes(self, results, time_budget=None, cancel_event=None):
+        """
+        Append README excerpts to GitHub results, fetching them concurrently
+        
+        Only READMEs that arrive within the time budget are used; the rest
+        are cancelled and those repositories keep their description alone.
+        Setting cancel_event stops the stage early.
+        
+        Args:
+            results (list): Fetched results; only GitHub ones are touched
+            time_budget (float): Seconds for the whole stage, defaults to enrichment_budget
+            cancel_event (threading.Event): Cancels outstanding README downloads when set
+        
+        Returns:
+            int: Number of repositories that got a README excerpt
+        """
+        repos = [r for r in results if r.get('source') == 'GitHub' and r.get('full_name') and not r.get('readme_enriched')]
+        if not repos:
+            return 0
+        
+        if time_budget is None:
+            time_budget = self.enrichment_budget
+        cancel_event = cancel_event or threading.Event()
+        
+        logger.info("📖 Fetching READMEs for %s GitHub repositories...", len(repos))
+        with self.tracer.span('enrich', repositories=len(repos)) as span:
+            executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(repos))))
+            try:
+                readme = self.tracer.bind(self.get_github_readme)
+                futures = {executor.submit(readme, r['full_name'], cancel_event): r for r in repos}
+                done, not_done = wait(futures, timeout=time_budget)
+            finally:
+                # Stop downloads that are still running and skip those not started
+                cancel_event.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+            span.set(missed=len(not_done))
+        
+        enriched = 0
+        for future in done:
+            readme_content = future.result()
+            if readme_content:
+                repo = futures[future]
+                repo['content'] = f"{repo['content']}\n\n{readme_content}"
+                repo['readme_enriched'] = True
+                enriched += 1
+        
+        if not_done:
+            logger.warning("⚠️ %s READMEs missed the %ss enrichment budget", len(not_done), time_budget)
+        logger.info("✅ Enriched %s of %s GitHub repositories", enriched, len(repos))
+        
+        return enriched
+    
+    def get_github_readme(self, repo_full_name, cancel_event=None):
+        """Get the first part of a GitHub repository README as plain text"""
         try:
-            readme_url = f"https://api.github.com/repos/{repo_full_name}/readme"
-            response = requests.get(readme_url, timeout=5)
-            
-            if response.status_code == 200:
-                readme_data = response.json()
+            readme_url, headers = self._readme_request(repo_full_name)
+            with self.tracer.span('readme', repository=repo_full_name) as span:
+                response = self._http_get(readme_url, headers=headers, priority=1, timeout=5, stream=True)
                 
-                # Decode base64 content
-                import base64
-                content = base64.b64decode(readme_data['content']).decode('utf-8')
-                
-                # Remove markdown formatting for cleaner text
-                content = re.sub(r'[#*`\[\]()]', '', content)
-                content = re.sub(r'\n+', '\n', content)
+                try:
+                    if response.status_code not in (200, 206):
+                        return ""
+                    
+                    raw = b""
+                    for chunk in response.iter_content(chunk_size=1024):
+                        if cancel_event is not None and cancel_event.is_set():
+                            return ""
+                        raw += chunk
+                        if len(raw) >= self.readme_max_bytes:
+                            break
+                finally:
+                    response.close()
                 
-                return content[:500]  # First 500 chars
+                span.set(bytes=len(raw))
+            
+            return self._readme_text(raw)
                 
-        except:
+        except Exception:
             pass
         
         return ""
     
-    def search_reddit(self, query, max_results=3):
-        """Search Reddit for discussions"""
-        results = []
-        try:
-            search_url = f"https://www.reddit.com/search.json?q={urllib.parse.quote(query)}&sort=relevance&limit={max_results}"
-            
-            headers = {'User-Agent': 'ResearchBot/1.0'}
+    def _readme_request(self, repo_full_name):
+        """URL and headers for the first readme_max_bytes of a repository README"""
+        # The raw media type skips the base64 JSON wrapper, and streaming
+        # lets us stop after readme_max_bytes instead of downloading it all
+        readme_url = f"https://api.github.com/repos/{repo_full_name}/readme"
+        headers = {
+            'Accept': 'application/vnd.github.raw',
+            'Range': f"bytes=0-{self.readme_max_bytes - 1}"
+        }
+        return readme_url, headers
+    
+    def _readme_text(self, raw):
+        """Plain text of the first readme_max_bytes of a README"""
+        # The cut may land inside a multi-byte character
+        content = raw[:self.readme_max_bytes].decode('utf-8', errors='ignore')
+        
+        # Remove markdown formatting for cleaner text
+        content = re.sub(r'[#*`\[\]()]', '', content)
+        content = re.sub(r'\n+', '\n', content)
+        
+        return content.strip()
+    
+    def search_reddit(self, query, max_results=3, since=None):
+        """Search Reddit for discussions, optionally only those posted after since"""
+        return self.search_source('reddit', query, max_results, since)
+    
+    def build_search_plan(self, query, categories, max_sources_per_category, since=None):
+        """List the searches to run for the selected categories, in report order"""
+        plan = []
+        
+        for category in categories:
+            if category not in self.trusted_sources:
+                logger.warning("⚠️ Unknown source category: %s", category)
+                continue
             
-            print(f"🔍 Searching Reddit for: {query}")
-            response = requests.get(search_url, headers=headers, timeout=10)
+            for key, config in self.trusted_sources[category].items():
+                if config.get('enabled', True):
+                    plan.append((category, self.adapters[key].name, self.search_source,
+                                 (key, query, max_sources_per_category, since)))
+        
+        return plan
+    
+    def fetch_sources(self, query, categories=['academic', 'general'], max_sources_per_category=2, concurrent=False, since=None):
+        """
+        Query every selected source and collect the raw results
+        
+        Results are always returned in plan order, whichever source answers
+        first. Sources that fail or miss the fetch deadline are reported as
+        partial failures instead of stalling the run. With since (an aware
+        datetime), sources that can filter by date only return newer items.
+        Concurrent fetches adapt their depth when adaptive_target is set
+        (see fetch_adaptive).
+        
+        Returns:
+            tuple: (results, failures) where failures is a list of
+            {'source': name, 'error': reason} dicts
+        """
+        plan = self.build_search_plan(query, categories, max_sources_per_category, since)
+        category_labels = {
+            'academic': "📚 Searching Academic Sources...",
+            'news': "📰 Searching News Sources...",
+            'general': "🌐 Searching General Sources...",
+            'tech': "💻 Searching Tech Sources..."
+        }
+        
+        with self.tracer.span('fetch', sources=len(plan)) as span:
+            all_results = []
+            failures = []
             
-            if response.status_code == 200:
-                data = response.json()
+            if concurrent and plan and self.adaptive_target:
+                all_results, failures = self.fetch_adaptive(plan, query, max_sources_per_category)
+            elif not concurrent:
+                started = time.monotonic()
+                current_category = None
                 
-                for post in data.get('data', {}).get('children', []):
-                    post_data = post.get('data', {})
+                for category, name, search, args in plan:
+                    if category != current_category:
+                        logger.info("%s", category_labels.get(category, f'Searching {category} sources...'))
+                        current_category = category
                     
-                    title = post_data.get('title', '')
-                    selftext = post_data.get('selftext', '')
-                    url = f"https://reddit.com{post_data.get('permalink', '')}"
+                    if self.fetch_deadline and time.monotonic() - started > self.fetch_deadline:
+                        failures.append({'source': name, 'error': 'deadline exceeded'})
+                        continue
                     
-                    # Combine title and content
-                    content = f"{title}\n\n{selftext}" if selftext else title
+                    try:
+                        all_results.extend(search(*args, raise_errors=True))
+                    except Exception as e:
+                        failures.append({'source': name, 'error': str(e)})
+            elif plan:
+                logger.info("⚡ Querying %s sources concurrently...", len(plan))
+                
+                executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(plan))))
+                try:
+                    futures = [executor.submit(self.tracer.bind(search), *args, raise_errors=True)
+                               for _, _, search, args in plan]
+                    done, _ = wait(futures, timeout=self.fetch_deadline)
                     
-                    if len(content) > 50:  # Only include substantial posts
-                        results.append({
-                            'title': title,
-                            'url': url,
-                            'content': content[:800],  # Limit content
-                            'source': 'Reddit',
-                            'type': 'discussion',
-                            'subreddit': post_data.get('subreddit', '')
-                        })
+                    for (_, name, _, _), future in zip(plan, futures):
+                        if future not in done:
+                            future.cancel()
+                            failures.append({'source': name, 'error': 'deadline exceeded'})
+                            continue
+                        
+                        try:
+                            all_results.extend(future.result())
+                        except Exception as e:
+                            failures.append({'source': name, 'error': str(e)})
+                finally:
+                    # Don't block on stragglers that already missed the deadline
+                    executor.shutdown(wait=False, cancel_futures=True)
+            
+            span.set(results=len(all_results), failures=len(failures))
+        
+        for failure in failures:
+            logger.warning("⚠️ Partial results: %s failed (%s)", failure['source'], failure['error'])
+        
+        return all_results, failures
+    
+    def fetch_adaptive(self, plan, query, depth):
+        """
+        Run a search plan concurrently, stopping as soon as results are good enough
+        
+        Every source is first searched with depth results. After each search
+        completes, the remaining ones are cancelled if adaptive_target
+        relevant unique results have arrived. When all searches finish short
+        of it, the sources that returned a full page are searched again with
+        twice the depth, until adaptive_max_depth or the time budget. Streamed
+        bodies of cancelled searches are closed; requests already waiting
+        for a plain response are left to finish in the background.
+        
+        Returns:
+            tuple: (results in plan order, failures) like fetch_sources
+        """
+        controller = AdaptiveFetch(query, self.adaptive_target, self.adaptive_min_relevance,
+                                   self.adaptive_max_depth, self.dedup_threshold, self.select_candidates)
+        budget = self.adaptive_time_budget or self.fetch_deadline
+        deadline = time.monotonic() + budget if budget else None
+        cancel_event = threading.Event()
+        failures = []
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(plan))))
+        search = self.tracer.bind(self.search_source)
+        
+        def submit(index, search_depth):
+            key, _, _, since = plan[index][3]
+            return executor.submit(search, key, query, search_depth, since, cancel_event, raise_errors=True)
+        
+        logger.info("⚡ Querying %s sources concurrently (adaptive, %s relevant results wanted)...",
+                    len(plan), self.adaptive_target)
+        pending = {submit(i, depth): (i, depth) for i in range(len(plan))}
+        searches = len(pending)
+        stopped_early = False
+        
+        try:
+            while pending:
+                timeout = max(0.0, deadline - time.monotonic()) if deadline else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
                 
-                print(f"✅ Found {len(results)} Reddit discussions")
+                if not done:
+                    # Out of time; wider searches keep the results already in
+                    for index, _ in pending.values():
+                        if index not in controller.results:
+                            failures.append({'source': plan[index][1], 'error': 'deadline exceeded'})
+                    break
                 
-        except Exception as e:
-            print(f"❌ Error searching Reddit: {e}")
+                for future in done:
+                    index, search_depth = pending.pop(future)
+                    try:
+                        controller.add(index, future.result(), search_depth)
+                    except Exception as e:
+                        # A failed wider search keeps the source's earlier page
+                        if not controller.results.get(index):
+                            failures.append({'source': plan[index][1], 'error': str(e)})
+                        controller.add(index, [], search_depth)
+                
+                if controller.satisfied():
+                    stopped_early = bool(pending)
+                    if pending:
+                        logger.info("⏹️ %s relevant results; cancelling %s searches",
+                                    controller.relevant_count(), len(pending))
+                    break
+                
+                if not pending:
+                    for index, wider in controller.to_widen():
+                        pending[submit(index, wider)] = (index, wider)
+                    if pending:
+                        searches += len(pending)
+                        logger.info("🔎 Only %s relevant results; widening %s sources",
+                                    controller.relevant_count(), len(pending))
+        finally:
+            cancel_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
         
-        return results
+        self.last_fetch_stats = {
+            'searches': searches,
+            'widened': controller.widened,
+            'cancelled': len(pending),
+            'relevant_results': controller.relevant_count(),
+            'stopped_early': stopped_early
+        }
+        return controller.results_in_plan_order(), failures
     
-    def conduct_research(self, query, categories=['academic', 'general'], max_sources_per_category=2):
+    def conduct_research(self, query, categories=['academic', 'general'], max_sources_per_category=2, concurrent=False, batch=False, incremental=False, on_token=None, use_index=False):
         """
         Conduct research using trusted sources
         
@@ -290,246 +721,763 @@ class TrustedSourcesResearcher:
             query (str): Research query
             categories (list): Categories to search in
             max_sources_per_category (int): Max sources per category
+            concurrent (bool): Query all selected sources at once
+            batch (bool): Pack short sources into shared analysis prompts
+            incremental (bool): Reuse the latest saved data for this query and
+                only fetch and analyze what is new since then
+            on_token (callable): Stream analyses as on_token(source, text),
+                source being the result dict being analyzed; text None means
+                the text streamed so far for source is to be discarded
+                (a model failed mid-reply and another attempt follows)
+            use_index (bool): Add similar sources from the local index to the
+                candidates without fetching them again; they are analyzed for
+                this query (through the analysis cache)
         """
-        print(f"🚀 Starting trusted source research for: {query}")
-        print("=" * 60)
+        with self.tracer.span('research', query=query):
+            return self._conduct_research(query, categories, max_sources_per_category, concurrent,
+                                          batch, incremental, on_token, use_index)
+    
+    def _conduct_research(self, query, categories, max_sources_per_category, concurrent, batch, incremental,
+                          on_token, use_index):
+        """Body of conduct_research, inside the 'research' span"""
+        logger.info("🚀 Starting trusted source research for: %s", query)
+        logger.info("=" * 60)
         
-        all_results = []
+        recalled = self.recall(query) if use_index and self.index is not None else []
         
-        # Search each category
-        for category in categories:
-            if category == 'academic':
-                print(f"\n📚 Searching Academic Sources...")
-                
-                # arXiv
-                arxiv_results = self.search_arxiv(query, max_sources_per_category)
-                all_results.extend(arxiv_results)
-                
-                # Semantic Scholar
-                scholar_results = self.search_semantic_scholar(query, max_sources_per_category)
-                all_results.extend(scholar_results)
-                
-            elif category == 'general':
-                print(f"\n🌐 Searching General Sources...")
-                
-                # Wikipedia
-                wiki_results = self.search_wikipedia(query)
-                all_results.extend(wiki_results)
-                
-                # Reddit
-                reddit_results = self.search_reddit(query, max_sources_per_category)
-                all_results.extend(reddit_results)
-                
-            elif category == 'tech':
-                print(f"\n💻 Searching Tech Sources...")
-                
-                # GitHub
-                github_results = self.search_github(query, max_sources_per_category)
-                all_results.extend(github_results)
+        previous = self.load_previous_data(query) if incremental else None
+        since = None
+        if previous:
+            since = datetime.strptime(previous['timestamp'], "%Y%m%d_%H%M%S").astimezone(timezone.utc)
+            logger.info("♻️ Incremental run: reusing %s sources from %s",
+                        len(previous['sources']), previous['timestamp'])
         
-        # Analyze results with AI
-        print(f"\n🤖 Analyzing {len(all_results)} sources...")
-        analyzed_results = []
+        all_results, failures = self.fetch_sources(query, categories, max_sources_per_category, concurrent, since)
         
-        for result in all_results:
-            if result.get('content') and len(result['content']) > 100:
-                analysis = self.analyze_with_ollama(result['content'], query)
-                
-                analyzed_results.append({
-                    'title': result['title'],
-                    'url': result['url'],
-                    'source': result['source'],
-                    'type': result.get('type', 'unknown'),
-                    'content': result['content'][:500] + "..." if len(result['content']) > 500 else result['content'],
-                    'analysis': analysis
-                })
-                
-                print(f"✅ Analyzed: {result['title'][:50]}...")
+        if previous:
+            known_urls = {source.get('url') for source in previous['sources']}
+            new_results = [r for r in all_results if r.get('url') not in known_urls]
+            logger.info("♻️ %s of %s fetched sources are new", len(new_results), len(all_results))
+            all_results = new_results
         
-        # Generate final report
-        if analyzed_results:
-            final_report = self.create_trusted_sources_report(query, analyzed_results)
-            self.save_report(query, final_report, analyzed_results)
-            
-            print(f"\n✅ Research completed! Found {len(analyzed_results)} quality sources.")
-            return final_report
-        else:
-            print("❌ No suitable sources found.")
+        if recalled:
+            # Recalled content is reused without fetching it again, but analyzed
+            # for this query: the stored analysis was written for the query that
+            # indexed it (the analysis cache still answers repeats of that query)
+            previous_urls = {normalize_url(source.get('url')) for source in previous['sources']} if previous else set()
+            recalled = [
+                {field: value for field, value in source.items() if field not in ('analysis', 'model')}
+                for source in recalled if normalize_url(source['url']) not in previous_urls
+            ]
+            recalled_urls = {normalize_url(source['url']) for source in recalled}
+            all_results = [r for r in all_results if normalize_url(r.get('url')) not in recalled_urls] + recalled
+        
+        all_results = self.deduplicate_results(all_results)
+        candidates = self.select_candidates(all_results, query)
+        
+        # Only repositories that are going to be analyzed get README excerpts
+        self.enrich_github_readmes(candidates)
+        previous_sources = previous['sources'] if previous else []
+        
+        # Reused sources are scored against this query so they rank with the new ones
+        previous_sources, _ = rank_results(query, previous_sources)
+        
+        if not candidates and not previous_sources:
+            logger.error("❌ No suitable sources found.")
             return None
+        
+        # The report lists sources by relevance, reused ones included; it is
+        # streamed while the analyses come in
+        entries = candidates + previous_sources
+        order = sorted(range(len(entries)), key=lambda i: -(entries[i].get('relevance') or 0))
+        position = {entry: rank for rank, entry in enumerate(order)}
+        
+        timestamp, report_filename, data_filename = self._output_paths()
+        logger.info("📝 Writing report to: %s", report_filename)
+        
+        with open(report_filename, 'w', encoding='utf-8') as f:
+            writer = ReportWriter(f, query, [entries[i] for i in order])
+            writer.write_header()
+            
+            for i, source in enumerate(previous_sources, len(candidates)):
+                writer.add_finding(position[i], source)
+            
+            # Analyze results with AI
+            forward = (lambda index, text: on_token(candidates[index], text)) if on_token else None
+            analyzed = self.analyze_sources(candidates, query, batch=batch, on_token=forward,
+                                            on_result=lambda index, record: writer.add_finding(position[index], record))
+            analyzed = analyzed + previous_sources
+            analyzed_results = [analyzed[i] for i in order]
+            
+            with self.tracer.span('report', sources=len(analyzed_results)):
+                writer.finish(analyzed_results)
+        
+        logger.info("💾 Report saved as: %s", report_filename)
+        self.save_data(query, timestamp, data_filename, analyzed_results, failures, report_filename)
+        
+        logger.info("✅ Research completed! Found %s quality sources.", len(analyzed_results))
+        with open(report_filename, 'r', encoding='utf-8') as f:
+            return f.read()
     
-    def analyze_with_ollama(self, content, query):
-        """Analyze content using Ollama with fallback models"""
-        models_to_try = ["tinyllama", "phi", "mistral:7b-instruct-q4_0"]
+    def recall(self, query, top_k=None, min_similarity=None):
+        """
+        Analyzed sources from the local index most similar to query
         
-        prompt = f"""
-        Analyze this content for the research query: "{query}"
+        Returns:
+            list: Source records with a 'similarity' field, most similar first
+        """
+        if self.index is None:
+            return []
         
-        Content: {content[:1500]}
+        started = time.perf_counter()
+        matches = self.index.query(
+            query,
+            top_k or self.recall_top_k,
+            self.recall_min_similarity if min_similarity is None else min_similarity
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
         
-        Provide key insights, facts, and how this relates to the query.
-        Keep it concise and focused.
+        logger.info("📚 %s similar sources in the local index (%s indexed, %.1f ms)",
+                    len(matches), len(self.index), elapsed_ms)
+        return [{**{field: match.get(field) for field in META_FIELDS}, 'similarity': match['similarity']} for match in matches]
+    
+    def load_previous_data(self, query):
+        """
+        Load the most recent data saved for query
+        
+        Returns:
+            dict: The saved data, or None if this query was never saved
         """
+        if self.store is not None:
+            return self.store.latest(query)
         
-        for model in models_to_try:
+        wanted = normalize_query(query)
+        
+        # Timestamped names sort chronologically, newest last
+        for path in sorted(glob.glob(os.path.join(self.output_dir, "trusted_data_*.json")), reverse=True):
             try:
-                response = ollama.chat(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                return response['message']['content']
-            except Exception as e:
-                if "memory" in str(e).lower():
-                    continue
-                else:
-                    break
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("⚠️ Skipping unreadable data file %s: %s", path, e)
+                continue
+            
+            if normalize_query(data.get('query', '')) == wanted:
+                return data
         
-        return f"Content summary: {content[:300]}..."
+        return None
     
-    def create_trusted_sources_report(self, query, results):
-        """Create a structured report from trusted sources"""
-        from datetime import datetime
+    def deduplicate_results(self, results):
+        """
+        Collapse results that are the same work found on several platforms
         
-        report = f"""
-{'='*80}
-TRUSTED SOURCES RESEARCH REPORT
-{'='*80}
-
-Query: {query}
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-Sources: {len(results)} trusted sources
-
-{'='*80}
-
-EXECUTIVE SUMMARY
------------------
-This report analyzes {len(results)} sources from trusted platforms including
-academic databases, Wikipedia, and verified repositories to provide reliable
-information about {query}.
-
-SOURCE BREAKDOWN
-----------------
-"""
-        
-        # Count sources by type
-        source_counts = {}
-        for result in results:
-            source = result.get('source', 'Unknown')
-            source_counts[source] = source_counts.get(source, 0) + 1
-        
-        for source, count in source_counts.items():
-            report += f"• {source}: {count} sources\n"
-        
-        report += "\n"
-        
-        # Key findings from each source
-        report += """
-KEY FINDINGS
-------------
-"""
-        
-        for i, result in enumerate(results, 1):
-            title = result.get('title', f'Source {i}')
-            source = result.get('source', 'Unknown')
-            analysis = result.get('analysis', 'No analysis available')
+        Same URL, DOI or arXiv id, or near-identical content, become one
+        record listing every platform in 'found_in', so each work is
+        analyzed once.
+        """
+        with self.tracer.span('dedup', results=len(results)) as span:
+            unique, stats = deduplicate(results, self.dedup_threshold)
+            span.set(collapsed=stats['collapsed'])
+        stats['inference_calls_avoided'] = len(self.select_candidates(results)) - len(self.select_candidates(unique))
+        self.last_dedup_stats = stats
+        
+        if stats['collapsed']:
+            logger.info("🧬 Collapsed %s duplicate results (%s same id, %s near-identical); %s analyses avoided",
+                        stats['collapsed'], stats['exact_matches'], stats['near_duplicates'],
+                        stats['inference_calls_avoided'])
+        return unique
+    
+    def select_candidates(self, results, query=None):
+        """
+        Keep the results with enough content to be worth analyzing
+        
+        With a query, candidates are also ranked by BM25 relevance (most
+        relevant first, with a 'relevance' field) and pruned to
+        relevance_top_k / min_relevance.
+        """
+        candidates = [r for r in results if r.get('content') and len(r['content']) > 100]
+        if query is None:
+            return candidates
+        
+        with self.tracer.span('rank', candidates=len(candidates)) as span:
+            ranked, pruned = rank_results(query, candidates, self.relevance_top_k, self.min_relevance)
+            span.set(pruned=pruned)
+        if pruned:
+            logger.info("✂️ Skipping %s of %s candidates as not relevant enough", pruned, len(candidates))
+        return ranked
+    
+    def analyze_sources(self, results, query, batch=False, on_result=None, on_token=None):
+        """
+        Analyze fetched results on a bounded worker pool
+        
+        Up to max_in_flight ollama.chat requests run at once. Prompts are
+        sized for the selected model's context window: long sources are
+        summarized map-reduce style, and in batch mode short sources are
+        packed into shared prompts and the reply is split back per source.
+        
+        Args:
+            results (list): Raw results from fetch_sources
+            query (str): Research query
+            batch (bool): Pack short sources into shared prompts
+            on_result (callable): Called as on_result(index, record) as soon
+                as each analysis is ready, index being the position in
+                select_candidates(results)
+            on_token (callable): Stream the analyses, calling
+                on_token(index, text) for each generated piece, or with text
+                None to discard what was streamed for index so far (sources
+                analyzed in a shared batch prompt are not streamed)
+        
+        Returns:
+            list: Analyzed records, in the same order as select_candidates(results)
+        """
+        candidates = self.select_candidates(results)
+        logger.info("🤖 Analyzing %s sources...", len(candidates))
+        
+        analyzed = [None] * len(candidates)
+        if not candidates:
+            return []
+        
+        with self._stats_lock:
+            counters_before = dict(self.llm_counters)
+        started = time.monotonic()
+        
+        # Each job is a list of candidate indexes analyzed together
+        if batch:
+            jobs = self._plan_batches(candidates)
+        else:
+            jobs = [[i] for i in range(len(candidates))]
+        
+        def run_job(indexes):
+            if len(indexes) == 1:
+                content = candidates[indexes[0]]['content']
+                forward = (lambda text: on_token(indexes[0], text)) if on_token else None
+                return {indexes[0]: self._analyze(content, query, forward)}
             
-            # Wrap text properly
-            import textwrap
-            wrapped_analysis = textwrap.fill(analysis, width=75, initial_indent='', subsequent_indent='   ')
+            analyses = self._analyze_batch([candidates[i]['content'] for i in indexes], query)
+            return dict(zip(indexes, analyses))
+        
+        with self.tracer.span('analyze', sources=len(candidates), jobs=len(jobs)), \
+                ThreadPoolExecutor(max_workers=max(1, self.max_in_flight)) as executor:
+            futures = [executor.submit(self.tracer.bind(run_job), job) for job in jobs]
             
-            report += f"""
-{i}. [{source}] {title}
-   {wrapped_analysis}
-
-"""
-        
-        # Detailed sources
-        report += """
-DETAILED SOURCES
-----------------
-"""
-        
-        for i, result in enumerate(results, 1):
-            title = result.get('title', f'Source {i}')
-            url = result.get('url', 'No URL')
-            source = result.get('source', 'Unknown')
-            content = result.get('content', 'No content')
+            for future in as_completed(futures):
+                for index, (analysis, model) in future.result().items():
+                    result = candidates[index]
+                    analyzed[index] = self._make_analyzed_record(result, analysis, model)
+                    logger.info("✅ Analyzed: %s...", result['title'][:50])
+                    
+                    if on_result:
+                        on_result(index, analyzed[index])
+        
+        elapsed = max(time.monotonic() - started, 1e-6)
+        with self._stats_lock:
+            requests_made = self.llm_counters['requests'] - counters_before['requests']
+            prompt_tokens = self.llm_counters['prompt_tokens'] - counters_before['prompt_tokens']
+            tokens = prompt_tokens + self.llm_counters['completion_tokens'] - counters_before['completion_tokens']
+            model_seconds = self.llm_counters['model_seconds'] - counters_before['model_seconds']
+        
+        self.analysis_stats = {
+            'sources': len(candidates),
+            'requests': requests_made,
+            'tokens': tokens,
+            'seconds': round(elapsed, 3),
+            'sources_per_sec': round(len(candidates) / elapsed, 3),
+            'tokens_per_sec': round(tokens / elapsed, 1),
+            # Prompt tokens analyzed per second the model spent on requests
+            'model_seconds': round(model_seconds, 3),
+            'analyzed_tokens_per_model_sec': round(prompt_tokens / model_seconds, 1) if model_seconds else 0.0
+        }
+        logger.info("📈 Analysis throughput: %s sources/sec, %s tokens/sec, "
+                    "%s analyzed tokens per model second (%s LLM requests)",
+                    self.analysis_stats['sources_per_sec'], self.analysis_stats['tokens_per_sec'],
+                    self.analysis_stats['analyzed_tokens_per_model_sec'], requests_made)
+        
+        return analyzed
+    
+    def _plan_batches(self, candidates):
+        """Group consecutive short sources into batches that fit one prompt"""
+        budget = self._input_budget()
+        if self.batch_max_tokens:
+            budget = min(budget, self.batch_max_tokens)
+        
+        return pack([estimate_tokens(result['content']) for result in candidates], budget)
+    
+    def _selected_model(self):
+        """Model the next prompt will most likely go to"""
+        candidates = self.models.candidates()
+        return candidates[0] if candidates else self.model_name
+    
+    def _input_budget(self):
+        """Tokens of source text that fit in one prompt to the selected model"""
+        return input_budget(self._selected_model())
+    
+    def _make_analyzed_record(self, result, analysis, model=None):
+        """Build the stored record for an analyzed result"""
+        return {
+            'title': result['title'],
+            'url': result['url'],
+            'source': result['source'],
+            'type': result.get('type', 'unknown'),
+            'content': result['content'][:500] + "..." if len(result['content']) > 500 else result['content'],
+            'analysis': analysis,
+            'model': model,
+            'found_in': result.get('found_in', [result['source']]),
+            'relevance': result.get('relevance')
+        }
+    
+    def _chat(self, model, prompt, on_token=None):
+        """
+        Send one chat request, respecting the in-flight limit and recording metrics
+        
+        With on_token the reply is streamed and on_token(text) is called for
+        every piece as it arrives.
+        
+        Returns:
+            dict: {'content', 'prompt_eval_count', 'eval_count'}
+        """
+        messages = [{"role": "user", "content": prompt}]
+        time_to_first_token = None
+        
+        # Ask for the context window prompts were sized for
+        options = {'num_ctx': context_window(model)}
+        
+        with self._llm_slots, self.tracer.span('llm', model=model) as span:
+            started = time.monotonic()
             
-            # Format URL for readability
-            display_url = url[:60] + "..." if len(url) > 60 else url
+            if on_token is None:
+                response = self.llm.chat(model=model, messages=messages, options=options,
+                                         keep_alive=self.models.keep_alive)
+                content = response['message']['content']
+                final = response
+            else:
+                pieces = []
+                final = {}
+                for chunk in self.llm.chat(model=model, messages=messages, options=options, stream=True,
+                                           keep_alive=self.models.keep_alive):
+                    text = chunk['message']['content']
+                    if text:
+                        if time_to_first_token is None:
+                            time_to_first_token = time.monotonic() - started
+                        pieces.append(text)
+                        on_token(text)
+                    if chunk.get('done'):
+                        final = chunk
+                content = "".join(pieces)
             
-            import textwrap
-            wrapped_content = textwrap.fill(content, width=75, initial_indent='', subsequent_indent='   ')
+            latency = time.monotonic() - started
             
-            report += f"""
-Source {i}: {title}
-Platform: {source}
-URL: {display_url}
-
-Content Summary:
-{wrapped_content}
-
-"""
+            reply = self._record_chat(model, content, final, latency, time_to_first_token)
+            span.set(prompt_tokens=reply['prompt_eval_count'], completion_tokens=reply['eval_count'],
+                     time_to_first_token=time_to_first_token)
+        
+        return reply
+    
+    def _record_chat(self, model, content, final, latency, time_to_first_token=None):
+        """Update the LLM counters and per-model metrics for one finished chat request"""
+        reply = {
+            'content': content,
+            'prompt_eval_count': final.get('prompt_eval_count') or 0,
+            'eval_count': final.get('eval_count') or 0
+        }
         
-        report += f"""
-{'='*80}
-Report generated using trusted, accessible sources
-Avoiding paywalls and bot-detection issues
-{'='*80}
-"""
+        with self._stats_lock:
+            self.llm_counters['requests'] += 1
+            self.llm_counters['prompt_tokens'] += reply['prompt_eval_count']
+            self.llm_counters['completion_tokens'] += reply['eval_count']
+            self.llm_counters['model_seconds'] += latency
+            
+            metrics = self.model_metrics.setdefault(model, {
+                'calls': 0, 'latency': 0.0, 'completion_tokens': 0,
+                'streamed_calls': 0, 'time_to_first_token': 0.0
+            })
+            metrics['calls'] += 1
+            metrics['latency'] += latency
+            metrics['completion_tokens'] += reply['eval_count']
+            if time_to_first_token is not None:
+                metrics['streamed_calls'] += 1
+                metrics['time_to_first_token'] += time_to_first_token
         
-        return report
+        return reply
     
-    def save_report(self, query, report, research_data):
-        """Save the research report"""
+    def model_latency_stats(self):
+        """Average latency, time-to-first-token and tokens/sec for every model used so far"""
+        with self._stats_lock:
+            metrics = {model: dict(m) for model, m in self.model_metrics.items()}
+        
+        stats = {}
+        for model, m in metrics.items():
+            stats[model] = {
+                'calls': m['calls'],
+                'avg_latency': round(m['latency'] / m['calls'], 3),
+                'avg_time_to_first_token': round(m['time_to_first_token'] / m['streamed_calls'], 3) if m['streamed_calls'] else None,
+                'tokens_per_sec': round(m['completion_tokens'] / m['latency'], 1) if m['latency'] else 0.0
+            }
+        
+        return stats
+    
+    def _complete(self, prompt, on_token=None):
+        """
+        Run a prompt through the healthy models, best first
+        
+        With on_token, a model failing after part of its reply was streamed
+        is followed by on_token(None) before anything else is streamed (the
+        next model's reply, or the caller's fallback), so the partial reply
+        can be discarded.
+        
+        Returns:
+            tuple: (reply, model), or (None, None) if every model failed
+        """
+        streamed = False
+        
+        def forward(text):
+            nonlocal streamed
+            streamed = True
+            on_token(text)
+        
+        for model in self.models.candidates():
+            if streamed:
+                on_token(None)
+                streamed = False
+            
+            try:
+                response = self._chat(model, prompt, forward if on_token else None)
+            except ConnectionError as e:
+                # Ollama itself is unreachable, so no other model will work either
+                logger.error("❌ Ollama is not reachable: %s", e)
+                break
+            except Exception as e:
+                self.models.record_failure(model, e)
+                continue
+            
+            self.models.record_success(model)
+            return response['content'], model
+        
+        if streamed:
+            on_token(None)
+        return None, None
+    
+    def _cached_analysis(self, content, query):
+        """Look up a cached analysis, returning (analysis, model) or (None, None)"""
+        if self.analysis_cache is None:
+            return None, None
+        return self.analysis_cache.get(self.models.preference_order(), ANALYSIS_PROMPT_VERSION, query, content)
+    
+    def _store_analysis(self, content, query, analysis, model):
+        """Remember an analysis produced by model"""
+        if self.analysis_cache is not None and model:
+            self.analysis_cache.put(model, ANALYSIS_PROMPT_VERSION, query, content, analysis)
+    
+    def analyze_with_ollama(self, content, query, on_token=None):
+        """
+        Analyze content using Ollama with fallback models
+        
+        With on_token the reply is streamed and on_token(text) receives each
+        piece as it is generated; cached analyses arrive as a single piece.
+        on_token(None) means a model failed mid-reply: discard the pieces
+        received so far, another attempt follows.
+        """
+        return self._analyze(content, query, on_token)[0]
+    
+    def iter_analysis(self, content, query):
+        """
+        Yield the analysis of content piece by piece as the model generates it
+        
+        A None piece means a model failed mid-reply: the pieces yielded so
+        far are to be discarded, another attempt follows.
+        """
+        pieces = queue.Queue()
+        done = object()
+        
+        def run():
+            try:
+                self._analyze(content, query, pieces.put)
+            finally:
+                pieces.put(done)
+        
+        threading.Thread(target=run, daemon=True).start()
+        
+        while True:
+            piece = pieces.get()
+            if piece is done:
+                return
+            yield piece
+    
+    def _analyze(self, content, query, on_token=None):
+        """Analyze one content, returning (analysis, model); model is None for the plain summary fallback"""
+        analysis, model = self._cached_analysis(content, query)
+        if analysis is not None:
+            if on_token:
+                on_token(analysis)
+            return analysis, model
+        
+        # Long contents are condensed chunk by chunk first (map), and the
+        # analysis is written from the combined notes (reduce)
+        text = content
+        budget = self._input_budget()
+        if estimate_tokens(content) > budget:
+            text = self._condense(content, query, budget)
+        
+        analysis, model = None, None
+        if text is not None:
+            analysis, model = self._complete(self._analysis_prompt(text, query), on_token)
+        
+        if analysis is None:
+            analysis = f"Content summary: {content[:300]}..."
+            if on_token:
+                on_token(analysis)
+            return analysis, None
+        
+        self._store_analysis(content, query, analysis, model)
+        return analysis, model
+    
+    def _condense(self, content, query, budget):
+        """
+        Map step for a content longer than budget tokens
+        
+        Every chunk is condensed to the facts relevant to query, in
+        parallel, and rounds repeat until the notes fit budget.
+        
+        Returns:
+            str: The notes, or None if no model could be reached
+        """
+        text = content
+        while estimate_tokens(text) > budget:
+            chunks = split_into_chunks(text, budget)
+            logger.info("🧩 Condensing %s chunks of a long source", len(chunks))
+            
+            prompts = [self._condense_prompt(n, len(chunks), chunk, query) for n, chunk in enumerate(chunks, 1)]
+            
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_in_flight, len(chunks)))) as executor:
+                notes = list(executor.map(self.tracer.bind(lambda prompt: self._complete(prompt)[0]), prompts))
+            
+            text, done = self._combine_notes(text, notes, budget)
+            if done:
+                return text
+        
+        return text
+    
+    def _combine_notes(self, text, notes, budget):
+        """
+        Join the notes of one condensing round
+        
+        Returns:
+            tuple: (new text, True if condensing must stop here)
+        """
+        if any(note is None for note in notes):
+            return None, True
+        
+        condensed = "\n\n".join(note.strip() for note in notes)
+        if len(condensed) >= len(text):
+            # The model didn't shorten anything; keep what fits
+            return condensed[:budget * 4], True
+        return condensed, False
+    
+    def _analysis_prompt(self, text, query):
+        """Prompt asking for the analysis of one source"""
+        return f"""
+        Analyze this content for the research query: "{query}"
+        
+        Content: {text}
+        
+        Provide key insights, facts, and how this relates to the query.
+        Keep it concise and focused.
+        """
+    
+    def _condense_prompt(self, n, total, chunk, query):
+        """Map-step prompt condensing chunk n of total of a long source"""
+        return f"""
+        This is part {n} of {total} of a document.
+        List the facts in it that matter for the research query: "{query}"
+        
+        Text: {chunk}
+        
+        Be brief; leave out anything unrelated to the query.
+        """
+    
+    def analyze_batch_with_ollama(self, contents, query):
+        """
+        Analyze several short contents with a single prompt
+        
+        The model is asked for one "### SOURCE n" section per content. Any
+        section missing from the reply is analyzed on its own instead.
+        
+        Returns:
+            list: One analysis per content, in input order
+        """
+        return [analysis for analysis, _ in self._analyze_batch(contents, query)]
+    
+    def _analyze_batch(self, contents, query):
+        """Batched counterpart of _analyze, returning one (analysis, model) per content"""
+        results = [self._cached_analysis(content, query) for content in contents]
+        pending = [i for i, (analysis, _) in enumerate(results) if analysis is None]
+        
+        if len(pending) == 1:
+            results[pending[0]] = self._analyze(contents[pending[0]], query)
+            return results
+        if not pending:
+            return results
+        
+        sources_text = "\n\n".join(
+            f"[SOURCE {n}]\n{contents[i]}" for n, i in enumerate(pending, 1)
+        )
+        
+        prompt = f"""
+        Analyze each of the following {len(pending)} sources for the research query: "{query}"
+        
+        {sources_text}
+        
+        For every source, write a section starting with a line "### SOURCE <number>",
+        followed by key insights, facts, and how it relates to the query.
+        Keep each section concise and focused.
+        """
+        
+        reply, model = self._complete(prompt)
+        sections = self._split_batch_reply(reply or "")
+        
+        for n, i in enumerate(pending, 1):
+            section = sections.get(n)
+            if section:
+                self._store_analysis(contents[i], query, section, model)
+                results[i] = (section, model)
+            else:
+                results[i] = self._analyze(contents[i], query)
+        
+        return results
+    
+    def _split_batch_reply(self, reply):
+        """Split a batched reply into {source number: analysis}"""
+        parts = re.split(r'^\s*#*\s*\[?SOURCE\s+(\d+)\]?\s*:?\s*$', reply, flags=re.MULTILINE | re.IGNORECASE)
+        
+        sections = {}
+        # parts = [preamble, number, text, number, text, ...]
+        for number, text in zip(parts[1::2], parts[2::2]):
+            text = text.strip()
+            if text:
+                sections[int(number)] = text
+        
+        return sections
+    
+    def create_trusted_sources_report(self, query, results):
+        """Create a structured report from trusted sources"""
+        return "".join(iter_report(query, results))
+    
+    def _output_paths(self):
+        """
+        Timestamp plus report and data file paths for a new run
+        
+        The report file is created right away so concurrent runs finishing
+        in the same second get distinct names (suffixed _1, _2, ...).
+        """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        suffix = 0
+        while True:
+            name = f"{timestamp}_{suffix}" if suffix else timestamp
+            report_filename = os.path.join(self.output_dir, f"trusted_research_{name}.txt")
+            try:
+                open(report_filename, 'x').close()
+                break
+            except FileExistsError:
+                suffix += 1
+        
+        data_filename = os.path.join(self.output_dir, f"trusted_data_{name}.json")
+        return timestamp, report_filename, data_filename
+    
+    def write_report(self, query, analyzed_results, failures=None):
+        """
+        Write the report and JSON data for results that are already analyzed
+        
+        Returns:
+            tuple: (report_filename, data_filename)
+        """
+        timestamp, report_filename, data_filename = self._output_paths()
+        
+        with self.tracer.span('report', sources=len(analyzed_results)), \
+                open(report_filename, 'w', encoding='utf-8') as f:
+            for section in iter_report(query, analyzed_results):
+                f.write(section)
+        
+        logger.info("💾 Report saved as: %s", report_filename)
+        self.save_data(query, timestamp, data_filename, analyzed_results, failures, report_filename)
+        return report_filename, data_filename
+    
+    def save_report(self, query, report, research_data, failures=None):
+        """Save the research report"""
+        timestamp, report_filename, data_filename = self._output_paths()
         
         # Save text report
-        report_filename = f"trusted_research_{timestamp}.txt"
-        with open(report_filename, 'w', encoding='utf-8') as f:
+        with self.tracer.span('save_report', bytes=len(report.encode('utf-8'))), \
+                open(report_filename, 'w', encoding='utf-8') as f:
             f.write(report)
         
-        # Save JSON data
-        data_filename = f"trusted_data_{timestamp}.json"
-        with open(data_filename, 'w', encoding='utf-8') as f:
-            json.dump({
-                'query': query,
-                'timestamp': timestamp,
-                'sources': research_data,
-                'report': report
-            }, f, indent=2, ensure_ascii=False)
-        
-        print(f"💾 Report saved as: {report_filename}")
-        print(f"💾 Data saved as: {data_filename}")
+        logger.info("💾 Report saved as: %s", report_filename)
+        self.save_data(query, timestamp, data_filename, research_data, failures, report_filename)
+    
+    def save_data(self, query, timestamp, data_filename, research_data, failures, report_filename):
+        """
+        Save the JSON data, pointing at the text report instead of embedding it
+        
+        With a results store the run is appended to the store and no
+        trusted_data_*.json file is written.
+        """
+        with self.tracer.span('save', sources=len(research_data)):
+            if self.store is not None:
+                run_id = self.store.append(query, timestamp, research_data, failures, os.path.basename(report_filename))
+                logger.info("💾 Data appended to results store as run %s", run_id)
+            else:
+                with open(data_filename, 'w', encoding='utf-8') as f:
+                    json.dump({
+                        'query': query,
+                        'timestamp': timestamp,
+                        'sources': research_data,
+                        'failures': failures or [],
+                        'report_file': os.path.basename(report_filename)
+                    }, f, indent=2, ensure_ascii=False)
+                
+                logger.info("💾 Data saved as: %s", data_filename)
+            
+            if self.index is not None:
+                added = self.index.add(research_data, query, os.path.basename(data_filename))
+                self.index.mark_indexed(data_filename)
+                logger.info("📚 Indexed %s new sources (%s total)", added, len(self.index))
 
 # Usage example
 if __name__ == "__main__":
-    # Initialize researcher
-    researcher = TrustedSourcesResearcher(model_name="tinyllama")
-    
-    # Test queries
-    test_queries = [
-        "artificial intelligence healthcare",
-        "machine learning algorithms",
-        "renewable energy storage",
-        "quantum computing applications"
-    ]
-    
-    for query in test_queries:
-        print(f"\n{'='*60}")
-        print(f"Testing: {query}")
-        print(f"{'='*60}")
-        
-        # Research using academic and general sources
-        report = researcher.conduct_research(
-            query=query,
-            categories=['academic', 'general'],
-            max_sources_per_category=2
-        )
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
+    # Initialize researcher (its sessions stay warm across queries)
+    with TrustedSourcesResearcher(model_name="tinyllama", cache_dir=".research_cache",
+                                  index_dir=os.path.join(".research_cache", "index"), trace=True) as researcher:
+        # Test queries
+        test_queries = [
+            "artificial intelligence healthcare",
+            "machine learning algorithms",
+            "renewable energy storage",
+            "quantum computing applications"
+        ]
         
-        if report:
-            print("✅ Research completed successfully!")
-        else:
-            print("❌ Research failed")
+        for query in test_queries:
+            logger.info("=" * 60)
+            logger.info("Testing: %s", query)
+            logger.info("=" * 60)
+            
+            # Research using academic and general sources
+            report = researcher.conduct_research(
+                query=query,
+                categories=['academic', 'general'],
+                max_sources_per_category=2,
+                concurrent=True
+            )
+            
+            if report:
+                logger.info("✅ Research completed successfully!")
+            else:
+                logger.error("❌ Research failed")
+        
+        logger.info("💾 Response cache: %s", researcher.response_cache.stats())
+        logger.info("⏳ Rate limit waits: %ss", researcher.rate_limiter.total_wait_seconds())
         
-        # Add delay between queries
-        time.sleep(2)
\ No newline at end of file
+        # Open in chrome://tracing or https://ui.perfetto.dev
+        trace_file = researcher.tracer.export_chrome_trace(os.path.join(".research_cache", "trace.json"))
+        logger.info("🕒 Stage timings: %s (trace: %s)", researcher.tracer.summary(), trace_file)
\ No newline at end of file